@@ -1,74 +1,315 @@
+import os
+import tempfile
+from io import BytesIO
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import ElasticNet
-from sklearn.preprocessing import StandardScaler
-
-# Streamlit app title
-st.title("Startup Profit Prediction 📈")
-
-# File uploader
-uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
-
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-    st.write("### Data Preview")
-    st.write(df.head())
-
-    # Display basic info
-    st.write("### Data Summary")
-    st.write(df.describe())
-    st.write("Missing Values:")
-    st.write(df.isnull().sum())
-
-    # Select features and target
-    features = ['R&D Spend', 'Administration', 'Marketing Spend']
-    target = 'Profit'
-
-    X = df[features]
-    y = df[target]
-
-    # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # Scale data
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    # Train ElasticNet model with best parameters
-    best_model = ElasticNet(alpha=1, l1_ratio=1.0)
-    best_model.fit(X_train_scaled, y_train)
-
-    # Predict on uploaded dataset
-    df['Predicted Profit'] = best_model.predict(scaler.transform(X))
-    st.write("### Predicted Values for Uploaded Dataset")
-    st.write(df[['R&D Spend', 'Administration', 'Marketing Spend', 'Profit', 'Predicted Profit']])
-
-    # Line graph to show difference between actual and predicted profit
-    st.write("### Actual vs Predicted Profit")
-    fig, ax = plt.subplots()
-    ax.plot(df.index, df['Profit'], label='Actual Profit', marker='o')
-    ax.plot(df.index, df['Predicted Profit'], label='Predicted Profit', marker='x')
-    ax.set_xlabel("Index")
-    ax.set_ylabel("Profit")
-    ax.legend()
-    st.pyplot(fig)
-
-    # Predict on new input
+from bootstrap import lazy_import, warm_imports
+from model_cache import ModelCache, file_digest, fit_elasticnet, predict_frame
+from model_registry import DEFAULT_REGISTRY_DIR, MicroBatcher, ModelRegistry
+from batch_scoring import score_csv_in_chunks
+from excel_export import lazy_file_download
+from tuning import DEFAULT_L1_RATIOS, tune_elasticnet
+from instrumentation import stage
+from display_layer import downsample, paged_dataframe
+from job_runner import JobRunner
+from profiling_panel import finish_rerun, profiled_rerun
+
+# matplotlib is only imported when the plot is drawn
+plt = lazy_import("matplotlib.pyplot")
+
+
+# One fitted-model cache shared by every session; set MODEL_CACHE_DIR to persist it across restarts
+@st.cache_resource
+def get_model_cache():
+    return ModelCache(max_entries=8, cache_dir=os.environ.get("MODEL_CACHE_DIR"))
+
+
+# Fits run in worker processes shared by every session; the page polls for results
+@st.cache_resource
+def get_job_runner():
+    runner = JobRunner()
+    runner.warm(["model_cache", "sklearn.linear_model", "sklearn.model_selection", "sklearn.preprocessing"])
+    return runner
+
+
+# Registered model versions, loaded once per process and shared by every session
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry(DEFAULT_REGISTRY_DIR)
+
+
+# Form predictions from every session are queued here and scored together, one call per model
+@st.cache_resource
+def get_micro_batcher():
+    return MicroBatcher(max_batch_rows=10_000, max_wait=0.01)
+
+
+@st.cache_data
+def load_csv(data):
+    return pd.read_csv(BytesIO(data))
+
+
+# Search results are reused for the same file and grid; the frame itself is not hashed
+@st.cache_data
+def run_search(digest, _df, features, target, l1_ratios, n_alphas, cv, n_jobs):
+    return tune_elasticnet(_df[features], _df[target], l1_ratios=l1_ratios, n_alphas=n_alphas, cv=cv, n_jobs=n_jobs)
+
+
+# Progress of a running job, refreshed every half second without rerunning the page;
+# the whole page reruns once the job is done so its result is picked up
+@st.fragment(run_every=0.5)
+def poll_job(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"{job.name}: {job.message} ({job.elapsed:,.0f}s)")
+
+
+# label -> loader of a prediction_form entry for every registered version, newest first.
+# Only the version picked in the form is loaded.
+def registered_models():
+    registry = get_model_registry()
+    models = {}
+    for name in registry.names():
+        for version in reversed(registry.versions(name)):
+            def load(name=name, version=version):
+                scaler, model, meta = registry.load(name, version)
+                return (name, version), scaler, model, meta["features"], meta.get("defaults", {})
+            models[f"{name} v{version}"] = load
+    return models
+
+
+# Input form for one of `models` (label -> loader of (batch key, scaler, model, features, default values)).
+# Inputs can be predicted one at a time or queued and predicted together in a single call.
+def prediction_form(models):
     st.write("### Make a Prediction")
+    label = st.selectbox("Model", list(models))
+    key, scaler, model, model_features, defaults = models[label]()
+
     input_data = []
-    for feature in features:
-        value = st.number_input(f"Enter {feature}", value=float(df[feature].mean()))
+    for feature in model_features:
+        value = st.number_input(f"Enter {feature}", value=float(defaults.get(feature, 0.0)))
         input_data.append(value)
 
-    if st.button("Predict Profit"):
-        input_data = np.array(input_data).reshape(1, -1)
-        input_scaled = scaler.transform(input_data)
-        prediction = best_model.predict(input_scaled)[0]
+    # Queued inputs belong to one model; choosing another model starts a new queue
+    queued = st.session_state.get("prediction_queue")
+    if queued is None or queued["model"] != label:
+        queued = st.session_state.prediction_queue = {"model": label, "rows": []}
+
+    predict_col, queue_col, run_col, clear_col = st.columns(4)
+    if predict_col.button("Predict Profit"):
+        with stage("Predict (batched)", rows=1):
+            prediction = get_micro_batcher().predict(key, scaler, model, model_features, [input_data])[0]
         st.write(f"### Predicted Profit: ${prediction:,.2f}")
+    if queue_col.button("Add to Queue"):
+        queued["rows"].append(input_data)
+    if clear_col.button("Clear Queue"):
+        queued["rows"] = []
+
+    if queued["rows"]:
+        queue_df = pd.DataFrame(queued["rows"], columns=model_features)
+        if run_col.button(f"Predict Queue ({len(queue_df)})"):
+            with stage("Predict (batched)", rows=len(queue_df)):
+                queue_df["Predicted Profit"] = get_micro_batcher().predict(key, scaler, model, model_features, queued["rows"])
+        st.dataframe(queue_df)
+
+
+# Record stage timings for this rerun (panel: open the page with ?profile=1); tracing and
+# profiling are stopped however the script ends
+with profiled_rerun("ML.py"):
+    # Streamlit app title
+    st.title("Startup Profit Prediction 📈")
+
+    # Load the modeling stack in the background once the title is on screen
+    warm_imports(["sklearn.linear_model", "sklearn.model_selection", "sklearn.preprocessing", "joblib", "matplotlib.pyplot"])
+
+    # Hyperparameters used for the fit; the tuning step below can replace them
+    if "enet_params" not in st.session_state:
+        st.session_state.enet_params = {"alpha": 1.0, "l1_ratio": 1.0}
+
+    # Interactive exploration renders the whole frame; batch scoring streams a separate file in chunks
+    mode = st.sidebar.radio("Mode", ["Explore & Predict", "Batch Score"])
+
+    # File uploader
+    uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
+
+    if uploaded_file:
+        file_bytes = uploaded_file.getvalue()
+        with stage("Load CSV") as loaded:
+            df = load_csv(file_bytes).copy()
+            loaded["rows"] = len(df)
+
+        # Select features and target; the spend columns are the default features
+        target = 'Profit'
+        candidates = [col for col in df.select_dtypes("number").columns if col != target]
+        features = st.multiselect(
+            "Features", candidates,
+            default=[col for col in ['R&D Spend', 'Administration', 'Marketing Spend'] if col in candidates]
+        )
+        if target not in df.columns or not features:
+            st.error(f"The file needs a numeric '{target}' column and at least one selected feature.")
+            finish_rerun()
+            st.stop()
+        digest = file_digest(file_bytes)
+
+        # Cross-validated search over l1_ratio x alpha paths
+        with st.expander("🔧 Tune Hyperparameters"):
+            l1_ratios = st.multiselect("l1_ratio grid", DEFAULT_L1_RATIOS, default=DEFAULT_L1_RATIOS)
+            n_alphas = st.number_input("Alphas per path", min_value=10, max_value=1000, value=100, step=10)
+            # Every fold needs at least one row
+            max_folds = max(2, min(20, len(df)))
+            cv = st.number_input("Folds", min_value=2, max_value=max_folds, value=min(5, max_folds), step=1)
+            n_jobs = st.selectbox(
+                "Parallel jobs", [-1] + list(range(1, (os.cpu_count() or 1) + 1)),
+                format_func=lambda jobs: "All cores" if jobs == -1 else str(jobs)
+            )
+
+            if l1_ratios and st.button("Run Search"):
+                try:
+                    st.session_state.search_result = (digest, run_search(
+                        digest, df, features, target, tuple(l1_ratios), int(n_alphas), int(cv), int(n_jobs)
+                    ))
+                except ValueError as e:
+                    st.error(f"The search could not run on this file: {e}")
+
+            search_digest, search_result = st.session_state.get("search_result", (None, None))
+            if search_result and search_digest == digest:
+                st.write(f"Best alpha: **{search_result['alpha']:.4g}**, best l1_ratio: **{search_result['l1_ratio']}**")
+                st.write("Wall time per fold:")
+                st.dataframe(search_result["fold_times"])
+                st.write("Top settings by cross-validated MSE:")
+                st.dataframe(search_result["cv_results"].head(20))
+                if st.button("Use Best Parameters"):
+                    st.session_state.enet_params = {"alpha": search_result["alpha"], "l1_ratio": search_result["l1_ratio"]}
+
+        params = st.session_state.enet_params
+        st.caption(f"ElasticNet alpha={params['alpha']:.4g}, l1_ratio={params['l1_ratio']}")
+
+        # Train ElasticNet model with best parameters; reruns with the same file and
+        # hyperparameters reuse the fitted scaler/model instead of refitting. The fit runs as a
+        # background job keyed like the model cache, so sessions fitting the same model share it.
+        model_key = ModelCache.make_key(digest, features, target, params["alpha"], params["l1_ratio"])
+        with stage("Get model (cached or fitted)", rows=len(df)):
+            fitted = get_model_cache().get(model_key)
+            if fitted is None:
+                job = get_job_runner().submit(
+                    fit_elasticnet, df, features, target, params["alpha"], params["l1_ratio"],
+                    name="Fit ElasticNet", key=model_key
+                )
+                get_job_runner().wait(job, timeout=0.5)
+        if fitted is None:
+            if not job.done:
+                poll_job(job.id)
+                finish_rerun()
+                st.stop()
+            if job.failed:
+                st.error(f"Model fit failed: {job.error()}")
+                finish_rerun()
+                st.stop()
+            fitted = job.result()
+            get_model_cache().put(model_key, fitted)
+        scaler, best_model = fitted
+
+        # Save the current fit as the next version of a named model
+        with st.sidebar.expander("📦 Model Registry"):
+            model_name = st.text_input("Model name", value="startup-profit")
+            if st.button("Register Current Model"):
+                try:
+                    meta = get_model_registry().save(
+                        model_name, scaler, best_model, features, target,
+                        alpha=params["alpha"], l1_ratio=params["l1_ratio"], data_digest=digest,
+                        train_file=uploaded_file.name, train_rows=len(df),
+                        defaults={feature: float(df[feature].mean()) for feature in features}
+                    )
+                    st.success(f"Registered {meta['name']} v{meta['version']}")
+                except ValueError as e:
+                    st.error(str(e))
+
+        if mode == "Batch Score":
+            st.write("### Batch Score a Large File")
+            st.write(f"Model trained on {len(df):,} rows of `{uploaded_file.name}`.")
+            scoring_file = st.file_uploader("Upload the CSV file to score", type=["csv"], key="scoring_file")
+            chunksize = st.number_input("Rows per chunk", min_value=1_000, value=100_000, step=10_000)
+
+            if scoring_file and st.button("Score File"):
+                progress_bar = st.progress(0.0, text="Scoring...")
+
+                def report_progress(rows, fraction):
+                    progress_bar.progress(fraction or 0.0, text=f"Scored {rows:,} rows")
+
+                # Chunks are appended to a temporary file so memory stays flat however big the input is
+                with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as output:
+                    output_path = output.name
+                    try:
+                        rows = score_csv_in_chunks(
+                            scoring_file, scaler, best_model, features, output,
+                            chunksize=int(chunksize), total_bytes=scoring_file.size, progress=report_progress
+                        )
+                    except ValueError as e:
+                        rows = None
+                        st.error(f"{e}. Please upload a valid file.")
+
+                if rows is not None:
+                    progress_bar.progress(1.0, text=f"Scored {rows:,} rows")
+                    # The session keeps one scored file; the one this run replaces is deleted
+                    previous_path = st.session_state.get("batch_output_path")
+                    if previous_path and os.path.exists(previous_path):
+                        os.remove(previous_path)
+                    st.session_state.batch_output_path = output_path
+                else:
+                    os.remove(output_path)
+
+            output_path = st.session_state.get("batch_output_path")
+            if output_path and os.path.exists(output_path):
+                st.download_button(
+                    label="📥 Download Scored File",
+                    data=lazy_file_download(output_path, "scored file"),
+                    file_name="scored_predictions.csv",
+                    mime="text/csv"
+                )
+        else:
+            st.write("### Data Preview")
+            st.write(df.head())
+
+            # Display basic info
+            st.write("### Data Summary")
+            st.write(df.describe())
+            st.write("Missing Values:")
+            st.write(df.isnull().sum())
+
+            # Predict on uploaded dataset
+            with stage("Predict", rows=len(df)):
+                df['Predicted Profit'] = predict_frame(scaler, best_model, df, features)
+            # One page at a time is sent to the browser
+            st.write("### Predicted Values for Uploaded Dataset")
+            paged_dataframe(df[features + [target, 'Predicted Profit']], "predictions")
 
+            # Line graph to show difference between actual and predicted profit, downsampled with LTTB
+            # for large files; markers are only drawn while individual points can still be told apart
+            st.write("### Actual vs Predicted Profit")
+            with stage("Plot", rows=len(df)) as plotted:
+                plot_df = downsample(df, [target, 'Predicted Profit'])
+                plotted["rows"] = len(plot_df)
+                markers = len(plot_df) <= 200
+                fig, ax = plt.subplots()
+                ax.plot(plot_df.index, plot_df['Profit'], label='Actual Profit', marker='o' if markers else None)
+                ax.plot(plot_df.index, plot_df['Predicted Profit'], label='Predicted Profit', marker='x' if markers else None)
+                ax.set_xlabel("Index")
+                ax.set_ylabel("Profit")
+                ax.legend()
+                st.pyplot(fig)
+                plt.close(fig)
+            if len(plot_df) < len(df):
+                st.caption(f"{len(plot_df):,} of {len(df):,} points drawn (LTTB downsampling).")
 
+            # Predict on new input with the current fit or any registered model
+            models = {"Current fit": lambda: (model_key, scaler, best_model, features, df[features].mean().to_dict())}
+            models.update(registered_models())
+            prediction_form(models)
 
+    # Registered models can be used without uploading a training file
+    else:
+        models = registered_models()
+        if models:
+            prediction_form(models)
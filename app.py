@@ -1,19 +1,61 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-from streamlit_calendar import calendar
-import io
+from datetime import date, datetime
+from uuid import uuid4
+from excel_export import export_file_name, export_mime, lazy_download
+from scheduler import generate_schedule
+from interval_index import BookingIndex
+from schedule_views import build_calendar_events, manday_summary
+from schedule_model import AUDITOR_COLUMNS, changed_rows, empty_schedule, from_display, replace_rows, to_display
+from storage import open_store
+from bootstrap import lazy_import, warm_imports
+from instrumentation import stage
+from display_layer import MAX_CALENDAR_EVENTS, date_window, filter_frame, pager, search_box
+from job_runner import JobRunner, input_hash, report_progress
+from profiling_panel import profiled_rerun
+
+# The grid and calendar components are only imported when a schedule is shown
+aggrid = lazy_import("st_aggrid")
+streamlit_calendar = lazy_import("streamlit_calendar")
 
 st.set_page_config(page_title="Audit Scheduler", layout="wide")
 
+# Audits and auditor info live in a shared store (SQLite by default, AUDIT_STORE=memory for in-memory)
+@st.cache_resource
+def get_store():
+    return open_store()
+
+store = get_store()
+
+# Schedule generation runs in worker processes shared by every session; the page polls for results
+@st.cache_resource
+def get_job_runner():
+    runner = JobRunner()
+    runner.warm(["scheduler"])
+    return runner
+
 # Initialize session state
-if "audit_data" not in st.session_state:
-    st.session_state.audit_data = {}
-if "site_auditor_info" not in st.session_state:
-    st.session_state.site_auditor_info = {}
+# schedule_data is the compact schedule frame (schedule_model); the grid and exports get display strings
 if "schedule_data" not in st.session_state:
-    st.session_state.schedule_data = pd.DataFrame()
+    st.session_state.schedule_data = empty_schedule()
+if "bookings" not in st.session_state:
+    st.session_state.bookings = BookingIndex.from_schedule(st.session_state.schedule_data) \
+        if not st.session_state.schedule_data.empty else BookingIndex()
+
+# Bumped on every change to schedule_data; derived views and exports are memoized on it
+if "schedule_version" not in st.session_state:
+    st.session_state.schedule_version = 0
+if "session_key" not in st.session_state:
+    st.session_state.session_key = uuid4().hex
+
+# Load the grid and calendar components in the background
+warm_imports(["st_aggrid", "streamlit_calendar"])
+
+# Columns that decide when and with whom an activity is booked
+BOOKING_COLUMNS = ["Proposed Date", "Start Time", "End Time", "Auditor 1", "Auditor 2"]
+
+# Calendar date windows, in days
+CALENDAR_WINDOWS = [7, 14, 31, 92]
 
 # ---------- PAGE: INPUT GENERATOR ----------
 def input_generator():
@@ -40,10 +82,20 @@ def input_generator():
             "Core Status": core_status,
             "Proposed Date": proposed_date.strftime("%Y-%m-%d")
         }
-        if site_name not in st.session_state.audit_data:
-            st.session_state.audit_data[site_name] = []
-        st.session_state.audit_data[site_name].append(new_entry)
-        st.success(f"Audit added for site: {site_name}")
+        if store.add_audit(site_name, new_entry):
+            st.success(f"Audit added for site: {site_name}")
+        else:
+            st.info(f"This audit is already stored for site: {site_name}")
+
+    with st.expander("📂 Import Input Workbook"):
+        workbook = st.file_uploader("Upload the Excel file generated by the input generator", type=["xlsx"])
+        if workbook and st.button("📥 Import Audits"):
+            try:
+                added, total = store.import_input_workbook(workbook)
+            except ValueError as e:
+                st.error(f"{e}. Please upload a workbook from the input generator.")
+            else:
+                st.success(f"Imported {added} audits" + (f" ({total - added} were already stored)." if added < total else "."))
 
     if site_name:
         st.markdown("### 👥 Define Auditors & Availability")
@@ -55,165 +107,227 @@ def input_generator():
                 availability[auditor.strip()] = st.number_input(f"Mandays available for {auditor.strip()}", value=3.0, step=0.5, key=auditor)
 
         if st.button("💾 Save Auditor Info"):
-            st.session_state.site_auditor_info[site_name] = {
+            store.save_auditor_info(site_name, {
                 "auditors": [a.strip() for a in auditors if a.strip()],
-                "coded_auditors": coded_auditors,
+                "coded_auditors": [a.strip() for a in coded_auditors if a.strip()],
                 "availability": availability
-            }
+            })
             st.success("Auditor info saved.")
 
+# ---------- SCHEDULE VERSIONING ----------
+def bump_schedule_version():
+    st.session_state.schedule_version += 1
+
+# Build a view of schedule_data once per schedule version (and extra key), then reuse it
+def memoized_view(name, build, *key):
+    cache = st.session_state.setdefault("view_cache", {})
+    cache_key = (st.session_state.schedule_version,) + key
+    if cache.get(name, (None, None))[0] != cache_key:
+        cache[name] = (cache_key, build())
+    return cache[name][1]
+
+# ---------- DOUBLE-BOOKING CHECKS ----------
+# Re-index one edited row; only that row's auditor days are touched
+def rebook(idx):
+    row = st.session_state.schedule_data.loc[idx]
+    st.session_state.bookings.update(idx, *row[BOOKING_COLUMNS[:3]], list(row[BOOKING_COLUMNS[3:]]))
+
+# Moved events, for both the "eventChange" callback state and a plain list of events
+def calendar_changes(calendar_state):
+    if not calendar_state:
+        return []
+    if calendar_state.get("callback") == "eventChange":
+        return [calendar_state["eventChange"]["event"]]
+    return calendar_state.get("event", []) if isinstance(calendar_state.get("event"), list) else []
+
 # ---------- CALENDAR DISPLAY ----------
-def render_calendar_and_get_updates(schedule_df):
-    events = []
-    for idx, row in schedule_df.iterrows():
-        start = datetime.strptime(f"{row['Proposed Date']} {row['Start Time']}", "%Y-%m-%d %H:%M")
-        end = datetime.strptime(f"{row['Proposed Date']} {row['End Time']}", "%Y-%m-%d %H:%M")
-        title = f"{row['Activity']} ({row['Auditor 1']}"
-        if row['Auditor 2']:
-            title += f" + {row['Auditor 2']}"
-        title += ")"
-        events.append({
-            "id": str(idx),
-            "title": title,
-            "start": start.isoformat(),
-            "end": end.isoformat(),
-            "color": "#6c5ce7" if row['Core Status'] == "Core" else "#00b894"
-        })
-
-    return calendar(events=events, options={"editable": True, "selectable": True}, key="calendar")
+# Only the activities inside the chosen date window (at most MAX_CALENDAR_EVENTS) are sent to the calendar
+def render_calendar_and_get_updates(schedule_df, conflict_rows=frozenset()):
+    dates = schedule_df["Proposed Date"].dropna()
+    start_col, days_col = st.columns(2)
+    window_start = start_col.date_input(
+        "📅 Calendar from", value=dates.min().date() if len(dates) else date.today(), key="calendar_start"
+    )
+    window_days = days_col.selectbox("Window", CALENDAR_WINDOWS, index=2, format_func=lambda days: f"{days} days")
+
+    def build():
+        in_window = schedule_df[date_window(schedule_df["Proposed Date"], window_start, window_days)]
+        shown = in_window.sort_values(["Proposed Date", "Start Time"]).head(MAX_CALENDAR_EVENTS)
+        return build_calendar_events(shown, conflict_rows), len(in_window)
+
+    events, in_window = memoized_view("calendar_events", build, window_start, window_days)
+    st.caption(f"{len(events):,} of {in_window:,} activities in this window shown "
+               f"({len(schedule_df):,} scheduled in total).")
+    return streamlit_calendar.calendar(
+        events=events,
+        options={"editable": True, "selectable": True, "initialDate": window_start.isoformat()},
+        key="calendar"
+    )
+
+# ---------- BACKGROUND JOBS ----------
+# Progress of a running job, refreshed every half second without rerunning the page;
+# the whole page reruns once the job is done so its result is picked up
+@st.fragment(run_every=0.5)
+def poll_job(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"{job.name}: {job.message} ({job.elapsed:,.0f}s)")
 
 # ---------- PAGE: SCHEDULE GENERATOR ----------
 def schedule_generator():
     st.title("📆 Schedule Generator")
 
-    if not st.session_state.get("audit_data") or not st.session_state.get("site_auditor_info"):
+    sites = store.sites()
+    if not sites or not store.auditor_info():
         st.warning("Please complete the Input Generator first.")
         return
 
-    sites = list(st.session_state.audit_data.keys())
-    selected_site = st.selectbox("🏢 Select Site", sites)
-    selected_audit_type = st.selectbox("🔍 Select Audit Type", ["IA", "P1", "P2", "P3", "P4", "P5", "RC"])
+    selected_sites = st.multiselect("🏢 Select Sites", sites, default=sites[:1])
+    selected_audit_types = st.multiselect("🔍 Select Audit Types", ["IA", "P1", "P2", "P3", "P4", "P5", "RC"], default=["IA"])
+    # Optional range of proposed dates; the store only returns audits inside it
+    date_range = st.date_input("📅 Proposed Dates (optional range)", value=(), key="audit_dates")
+    date_from = date_range[0].isoformat() if len(date_range) > 0 else None
+    date_to = date_range[1].isoformat() if len(date_range) > 1 else None
 
-    auditors = st.session_state.site_auditor_info[selected_site]["auditors"]
-    coded_auditors = st.session_state.site_auditor_info[selected_site]["coded_auditors"]
-    availability = st.session_state.site_auditor_info[selected_site]["availability"]
-    used_mandays = {auditor: 0.0 for auditor in auditors}
+    site_auditor_info = store.auditor_info(selected_sites)
+    auditors = sorted({auditor for info in site_auditor_info.values() for auditor in info["auditors"]})
 
     if st.button("⚙️ Generate Schedule"):
-        schedule_data = []
-        start_time = datetime.today().replace(hour=9, minute=0, second=0, microsecond=0)
-
-        for audit in st.session_state.audit_data[selected_site]:
-            if audit["Audit Type"] == selected_audit_type:
-                activities = [act for act, val in audit["Activities"].items() if val == "✔️"]
-                for activity in activities:
-                    duration = audit["Durations"].get(activity, 90)
-                    core_status = audit["Core Status"].get(activity, "Non-Core")
-                    allowed = coded_auditors if core_status == "Core" else auditors
-
-                    num_auditors = 2 if len(allowed) >= 2 else 1
-                    sorted_auditors = sorted(
-                        [a for a in allowed if used_mandays[a] < availability[a]],
-                        key=lambda x: used_mandays[x]
-                    )
-                    assigned_auditors = sorted_auditors[:num_auditors]
-
-                    hours = duration / 60
-                    for auditor in assigned_auditors:
-                        used_mandays[auditor] += round(hours / 8, 2)
-
-                    schedule_data.append({
-                        "Site": selected_site,
-                        "Activity": activity,
-                        "Core Status": core_status,
-                        "Proposed Date": audit["Proposed Date"],
-                        "Start Time": start_time.strftime('%H:%M'),
-                        "End Time": (start_time + timedelta(minutes=duration)).strftime('%H:%M'),
-                        "Auditor 1": assigned_auditors[0] if len(assigned_auditors) > 0 else "",
-                        "Auditor 2": assigned_auditors[1] if len(assigned_auditors) > 1 else "",
-                        "Allowed Auditors": ", ".join(allowed),
-                        "Duration (mins)": duration
-                    })
-
-                    start_time += timedelta(minutes=duration)
-                    if start_time.time() == datetime.strptime("13:00", "%H:%M").time():
-                        start_time += timedelta(minutes=30)
-
-        st.session_state.schedule_data = pd.DataFrame(schedule_data)
+        # Only the selected sites, audit types and dates are loaded; auditor bookings and mandays
+        # are shared across every selected site and date
+        with stage("Load audits") as loaded:
+            audit_data = store.audits(
+                sites=selected_sites, audit_types=selected_audit_types, date_from=date_from, date_to=date_to
+            )
+            loaded["rows"] = sum(len(audits) for audits in audit_data.values())
+        # Planners submitting the same inputs share one job
+        job = get_job_runner().submit(
+            generate_schedule, audit_data, site_auditor_info, sites=selected_sites, progress=report_progress,
+            name="Generate schedule", key=input_hash(audit_data, site_auditor_info, selected_sites)
+        )
+        get_job_runner().wait(job, timeout=0.5)
+        st.session_state.schedule_job = job.id
+
+    job = get_job_runner().get(st.session_state.get("schedule_job"))
+    if job is not None and not job.done:
+        poll_job(job.id)
+    elif job is not None:
+        del st.session_state.schedule_job
+        if job.failed:
+            st.error(f"Schedule generation failed: {job.error()}")
+        else:
+            # The result may be shared with other sessions through the job runner, so edits go to a copy
+            st.session_state.schedule_data = job.result().copy()
+            st.session_state.bookings = BookingIndex.from_schedule(st.session_state.schedule_data)
+            bump_schedule_version()
 
     if not st.session_state.schedule_data.empty:
-        calendar_events = render_calendar_and_get_updates(st.session_state.schedule_data)
+        calendar_events = render_calendar_and_get_updates(
+            st.session_state.schedule_data, st.session_state.bookings.conflicting_rows()
+        )
 
-        if "event" in calendar_events:
-            for event in calendar_events["event"]:
-                idx = int(event["id"])
-                start_dt = datetime.fromisoformat(event["start"])
-                end_dt = datetime.fromisoformat(event["end"])
-                st.session_state.schedule_data.at[idx, "Proposed Date"] = start_dt.date().strftime("%Y-%m-%d")
-                st.session_state.schedule_data.at[idx, "Start Time"] = start_dt.strftime("%H:%M")
-                st.session_state.schedule_data.at[idx, "End Time"] = end_dt.strftime("%H:%M")
+        for event in calendar_changes(calendar_events):
+            idx = int(event["id"])
+            start_dt = datetime.fromisoformat(event["start"])
+            end_dt = datetime.fromisoformat(event["end"])
+            moved = (pd.Timestamp(start_dt.date()), start_dt.hour * 60 + start_dt.minute, end_dt.hour * 60 + end_dt.minute)
+            if tuple(st.session_state.schedule_data.loc[idx, BOOKING_COLUMNS[:3]]) == moved:
+                continue
+            st.session_state.schedule_data.at[idx, "Proposed Date"] = moved[0]
+            st.session_state.schedule_data.at[idx, "Start Time"] = moved[1]
+            st.session_state.schedule_data.at[idx, "End Time"] = moved[2]
+            rebook(idx)
+            bump_schedule_version()
 
         st.markdown("### 📝 Editable Schedule Table")
-        gb = GridOptionsBuilder.from_dataframe(st.session_state.schedule_data)
+        # The grid only gets the current page of the filtered rows; a hidden Row column carries each
+        # row's index so edits map back to the schedule
+        schedule_df = st.session_state.schedule_data
+        site_col, auditor_col, search_col = st.columns(3)
+        grid_sites = site_col.multiselect("Sites", list(schedule_df["Site"].cat.categories), key="grid_sites")
+        grid_auditors = auditor_col.multiselect("Auditors", auditors, key="grid_auditors")
+        grid_search = search_box("grid", search_col)
+        view_key = (grid_search, tuple(grid_sites), tuple(grid_auditors))
+        view_index = memoized_view("grid_view", lambda: filter_frame(
+            schedule_df, grid_search, {"Site": grid_sites, tuple(AUDITOR_COLUMNS): grid_auditors}
+        ).index, *view_key)
+        start, stop = pager(len(view_index), "grid")
+        page_index = view_index[start:stop]
+
+        conflict_rows = st.session_state.bookings.conflicting_rows()
+        grid_df = memoized_view("grid_rows", lambda: to_display(schedule_df.loc[page_index]).assign(
+            Conflict=page_index.isin(list(conflict_rows)), Row=page_index
+        ), *view_key, start, stop)
+        gb = aggrid.GridOptionsBuilder.from_dataframe(grid_df)
         for col in ["Activity", "Proposed Date", "Start Time", "End Time", "Auditor 1", "Auditor 2"]:
             gb.configure_column(col, editable=True)
         gb.configure_column("Auditor 1", cellEditor="agSelectCellEditor", cellEditorParams={"values": auditors})
         gb.configure_column("Auditor 2", cellEditor="agSelectCellEditor", cellEditorParams={"values": auditors})
-        grid_response = AgGrid(
-            st.session_state.schedule_data,
-            gridOptions=gb.build(),
-            height=400,
-            update_mode=GridUpdateMode.VALUE_CHANGED,
-            key="schedule_grid"
-        )
-        st.session_state.schedule_data = grid_response["data"]
+        gb.configure_column("Row", hide=True)
+        gb.configure_grid_options(getRowStyle=aggrid.JsCode(
+            "function(params) { if (params.data.Conflict) { return {'background-color': '#ffcccc'}; } }"
+        ))
+        with stage("Render grid", rows=len(grid_df)):
+            # A new key per schedule version and page, so the grid never hands back rows it showed
+            # before the schedule changed
+            grid_response = aggrid.AgGrid(
+                grid_df,
+                gridOptions=gb.build(),
+                height=400,
+                update_mode=aggrid.GridUpdateMode.VALUE_CHANGED,
+                allow_unsafe_jscode=True,
+                key=f"schedule_grid_{st.session_state.schedule_version}_{input_hash(view_key, start, stop)[:16]}"
+            )
+
+        # Grid values come back as strings and are parsed into the compact frame;
+        # only rows whose booking columns changed are re-indexed
+        edited = grid_response["data"]
+        edited = edited[edited["Row"].isin(schedule_df.index)]
+        edited = edited.set_index(pd.Index(edited.pop("Row").astype(schedule_df.index.dtype)))
+        edited = edited.drop(columns=["Conflict"], errors="ignore")
+        previous = schedule_df.loc[edited.index]
+        edited = from_display(edited, previous)
+        booking_changed = changed_rows(previous, edited, BOOKING_COLUMNS)
+        edited_rows = booking_changed | changed_rows(previous, edited, ["Activity"])
+        if edited_rows.any():
+            st.session_state.schedule_data = replace_rows(schedule_df, edited[edited_rows])
+            for idx in edited.index[booking_changed]:
+                rebook(idx)
+            bump_schedule_version()
+
+        conflict_rows = st.session_state.bookings.conflicting_rows()
+        if conflict_rows:
+            st.warning(f"⚠️ {len(conflict_rows)} activities double-book an auditor (highlighted in red).")
 
         st.markdown("### 📊 Mandays Summary")
-        mandays = {auditor: 0.0 for auditor in auditors}
-        for _, row in st.session_state.schedule_data.iterrows():
-            duration = row["Duration (mins)"]
-            for auditor in [row["Auditor 1"], row["Auditor 2"]]:
-                if auditor:
-                    mandays[auditor] += round((duration / 60) / 8, 2)
-        manday_df = pd.DataFrame(list(mandays.items()), columns=["Auditor", "Mandays Used"])
+        manday_df = memoized_view(
+            "manday_summary", lambda: manday_summary(st.session_state.schedule_data, auditors), tuple(auditors)
+        )
         st.dataframe(manday_df)
 
         st.markdown("### 📥 Download Excel")
-        with io.BytesIO() as buffer:
-            with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-                st.session_state.schedule_data.to_excel(writer, index=False, sheet_name="Schedule")
-                manday_df.to_excel(writer, index=False, sheet_name="Manday Summary")
-            st.download_button("📤 Download Full Schedule", buffer.getvalue(), file_name="audit_schedule.xlsx")
+        # Written only when the button is clicked, then reused until the schedule changes
+        export_format = st.radio("Download format", ["xlsx", "csv", "parquet"], horizontal=True)
+        schedule_df = st.session_state.schedule_data
+        st.download_button(
+            "📤 Download Full Schedule",
+            lazy_download(
+                ("audit_schedule", st.session_state.session_key),
+                (st.session_state.schedule_version, tuple(auditors)),
+                lambda: {"Schedule": to_display(schedule_df), "Manday Summary": manday_df},
+                export_format
+            ),
+            file_name=export_file_name("audit_schedule", export_format),
+            mime=export_mime(export_format)
+        )
 
 # ---------- NAVIGATION ----------
-page = st.sidebar.selectbox("📚 Choose Page", ["Input Generator", "Schedule Generator"])
-if page == "Input Generator":
-    input_generator()
-else:
-    schedule_generator()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# Record stage timings for this rerun (panel: open the page with ?profile=1); tracing and
+# profiling are stopped however the script ends
+with profiled_rerun("app.py"):
+    page = st.sidebar.selectbox("📚 Choose Page", ["Input Generator", "Schedule Generator"])
+    if page == "Input Generator":
+        input_generator()
+    else:
+        schedule_generator()
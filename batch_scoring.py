@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# Spend columns are read as float32 so each chunk stays small and the dtype never has to be inferred
+SPEND_DTYPES = {'R&D Spend': np.float32, 'Administration': np.float32, 'Marketing Spend': np.float32}
+
+
+# Read `source` in chunks, predict each chunk with the fitted scaler/model and append it to `output`.
+# Only one chunk is held in memory at a time, whatever the size of the input.
+@timed("Batch score", rows=lambda rows: rows)
+def score_csv_in_chunks(source, scaler, model, features, output, chunksize=100_000,
+                        prediction_column='Predicted Profit', total_bytes=None, progress=None):
+    dtypes = {col: dtype for col, dtype in SPEND_DTYPES.items() if col in features}
+    rows = 0
+
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunksize, dtype=dtypes)):
+        if i == 0:
+            missing_columns = [col for col in features if col not in chunk.columns]
+            if missing_columns:
+                raise ValueError(f"Missing columns: {', '.join(missing_columns)}")
+
+        chunk[prediction_column] = model.predict(scaler.transform(chunk[features]))
+        chunk.to_csv(output, index=False, header=(i == 0))
+        rows += len(chunk)
+
+        if progress is not None:
+            fraction = min(source.tell() / total_bytes, 1.0) if total_bytes else None
+            progress(rows, fraction)
+
+    return rows
@@ -0,0 +1,337 @@
+# Throughput and peak memory of every pipeline at 1x, 10x and 100x its base size, without Streamlit.
+# Run from the repository root:
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --scales 1 10 --only rc_ schedule_
+#   python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+# With --baseline the run exits with status 1 when a case's throughput drops, or its peak memory
+# grows, by more than the threshold (a fraction of the baseline value).
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd
+
+from batch_scoring import score_csv_in_chunks
+from display_layer import downsample
+from excel_export import export_file, write_excel
+from interval_index import BookingIndex
+from league_regression import pairwise_ols
+from model_cache import fit_elasticnet, predict_frame
+from model_registry import MicroBatcher
+from rc_incremental import RCSnapshot
+from rc_ingest import read_rc_export
+from rc_processing import build_rc_cube, process_rc
+from schedule_model import to_display
+from schedule_views import build_calendar_events, manday_summary
+from scheduler import generate_schedule
+from synthetic import points_tables, rc_export, schedule_inputs, startup_profits
+
+FEATURES = ["R&D Spend", "Administration", "Marketing Spend"]
+SCALES = [1, 10, 100]
+
+# Peak memory growth below this is ignored by the regression check (allocator noise on small runs)
+MEMORY_SLACK_MIB = 1.0
+
+# name -> (base size, unit, setup). setup(n) builds the inputs outside the timed region and returns
+# a zero-argument callable that runs the pipeline once and returns the number of units processed.
+CASES = {}
+
+
+def case(name, base, unit="rows"):
+    def register(setup):
+        CASES[name] = (base, unit, setup)
+        return setup
+    return register
+
+
+@case("ml_fit", 10_000)
+def ml_fit(n):
+    df = startup_profits(n)
+
+    def run():
+        fit_elasticnet(df, FEATURES, "Profit", alpha=1.0, l1_ratio=1.0)
+        return n
+    return run
+
+
+@case("ml_predict", 10_000)
+def ml_predict(n):
+    df = startup_profits(n)
+    scaler, model = fit_elasticnet(df, FEATURES, "Profit", alpha=1.0, l1_ratio=1.0)
+    return lambda: len(predict_frame(scaler, model, df, FEATURES))
+
+
+# Single-row form predictions from 16 concurrent sessions, scored together by the micro-batcher
+@case("ml_serve_batched", 1_000, unit="requests")
+def ml_serve_batched(n):
+    df = startup_profits(n)
+    scaler, model = fit_elasticnet(df, FEATURES, "Profit", alpha=1.0, l1_ratio=1.0)
+    rows = df[FEATURES].to_numpy()
+    batcher = MicroBatcher(max_wait=0.002)
+
+    def run():
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(lambda row: batcher.predict("model", scaler, model, FEATURES, [row]), rows))
+        return n
+    return run
+
+
+@case("ml_batch_score", 10_000)
+def ml_batch_score(n):
+    df = startup_profits(n)
+    scaler, model = fit_elasticnet(df, FEATURES, "Profit", alpha=1.0, l1_ratio=1.0)
+    data = df.to_csv(index=False).encode("utf-8")
+    return lambda: score_csv_in_chunks(BytesIO(data), scaler, model, FEATURES, StringIO(), chunksize=100_000)
+
+
+@case("rc_ingest", 1_000)
+def rc_ingest(n):
+    target = BytesIO()
+    write_excel({"Sheet1": rc_export(n)}, target)
+    data = target.getvalue()
+    return lambda: len(read_rc_export(data, cache_dir=None))
+
+
+@case("rc_categorize", 10_000)
+def rc_categorize(n):
+    df = rc_export(n)
+    return lambda: len(process_rc(df))
+
+
+@case("rc_aggregate", 10_000)
+def rc_aggregate(n):
+    df = process_rc(rc_export(n))
+
+    def run():
+        build_rc_cube(df)
+        return n
+    return run
+
+
+# Alternates between two exports that differ in 1% of the rows plus 1% appended rows, so every run
+# applies a delta of about 3% to a snapshot of n rows
+@case("rc_incremental", 10_000)
+def rc_incremental(n):
+    before = rc_export(n)
+    after = before.copy()
+    after.loc[:n // 100, "Split Man-Days"] += 1
+    after = pd.concat([after, rc_export(n // 100, seed=7)], ignore_index=True)
+    snapshot = RCSnapshot()
+    snapshot.apply(before)
+    exports = [after, before]
+
+    def run():
+        exports.reverse()
+        summary = snapshot.apply(exports[1])
+        snapshot.cube()
+        return summary["added"] + summary["changed"] + summary["unchanged"]
+    return run
+
+
+def _export_case(fmt, n):
+    sheets = {"Processed Data": process_rc(rc_export(n))}
+
+    def run():
+        os.remove(export_file(sheets, fmt))
+        return n
+    return run
+
+
+@case("rc_export_xlsx", 2_000)
+def rc_export_xlsx(n):
+    return _export_case("xlsx", n)
+
+
+@case("rc_export_csv", 10_000)
+def rc_export_csv(n):
+    return _export_case("csv", n)
+
+
+@case("rc_export_parquet", 10_000)
+def rc_export_parquet(n):
+    return _export_case("parquet", n)
+
+
+@case("schedule_generate", 5, unit="activities")
+def schedule_generate(n):
+    audit_data, site_auditor_info = schedule_inputs(n)
+    return lambda: len(generate_schedule(audit_data, site_auditor_info))
+
+
+@case("schedule_conflicts", 5, unit="activities")
+def schedule_conflicts(n):
+    schedule_df = generate_schedule(*schedule_inputs(n))
+
+    def run():
+        BookingIndex.from_schedule(schedule_df)
+        return len(schedule_df)
+    return run
+
+
+@case("schedule_views", 5, unit="activities")
+def schedule_views(n):
+    audit_data, site_auditor_info = schedule_inputs(n)
+    schedule_df = generate_schedule(audit_data, site_auditor_info)
+    auditors = sorted({auditor for info in site_auditor_info.values() for auditor in info["auditors"]})
+
+    def run():
+        manday_summary(schedule_df, auditors)
+        build_calendar_events(schedule_df)
+        return len(schedule_df)
+    return run
+
+
+# The grid's paths on a multi-site schedule: date/time sort, one auditor's rows, one site's rows
+# and the display strings handed to the grid
+@case("schedule_filter_sort", 5, unit="activities")
+def schedule_filter_sort(n):
+    schedule_df = generate_schedule(*schedule_inputs(n))
+    auditor = schedule_df["Auditor 1"].iloc[0]
+
+    def run():
+        schedule_df.sort_values(["Proposed Date", "Start Time"])
+        schedule_df[(schedule_df["Auditor 1"] == auditor) | (schedule_df["Auditor 2"] == auditor)]
+        schedule_df[schedule_df["Site"] == "Site 0"]
+        to_display(schedule_df)
+        return len(schedule_df)
+    return run
+
+
+# Predicted-vs-actual points reduced to what the ML.py chart draws
+@case("chart_downsample", 100_000)
+def chart_downsample(n):
+    df = startup_profits(n)
+    df["Predicted Profit"] = df["Profit"] * 1.01
+
+    def run():
+        downsample(df, ["Profit", "Predicted Profit"])
+        return len(df)
+    return run
+
+
+# Every season pair of every league: 15 seasons give 210 ordered pairs per dataset
+@case("league_ols", 4, unit="fits")
+def league_ols(n):
+    values = points_tables(n)
+
+    def run():
+        slope, _, _, _ = pairwise_ols(values)
+        return slope.size - n * values.shape[2]
+    return run
+
+
+# Best wall time over `repeat` runs (fewer once `max_time` seconds are spent, more while fast runs stay
+# under `min_time`), then one extra run under tracemalloc for the peak, so tracing never slows the timed runs
+def measure(run, repeat=3, min_time=0.2, max_time=2.0, max_runs=50):
+    times = []
+    while not times or (len(times) < repeat and sum(times) < max_time) or (sum(times) < min_time and len(times) < max_runs):
+        gc.collect()
+        start = time.perf_counter()
+        units = run()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return units, min(times), peak / 2**20
+
+
+def run_suite(names, scales, repeat):
+    results = []
+    print(f"{'Case':<20} {'Scale':>6} {'Units':>10} {'Unit':<11} {'Best (s)':>9} {'Units/s':>13} {'Peak MiB':>9}")
+    for name in names:
+        base, unit, setup = CASES[name]
+        for scale in scales:
+            run = setup(base * scale)
+            units, seconds, peak_mib = measure(run, repeat=repeat)
+            result = {
+                "case": name,
+                "scale": scale,
+                "size": base * scale,
+                "units": units,
+                "unit": unit,
+                "seconds": seconds,
+                "throughput": units / seconds if seconds else float("inf"),
+                "peak_mib": peak_mib,
+            }
+            results.append(result)
+            print(f"{name:<20} {scale:>5}x {units:>10,} {unit:<11} {seconds:>9.4f} "
+                  f"{result['throughput']:>13,.0f} {peak_mib:>9.1f}", flush=True)
+    return results
+
+
+# Cases missing from either side are skipped, so a baseline can cover a subset of the suite
+def regressions(results, baseline, threshold):
+    previous = {(r["case"], r["scale"]): r for r in baseline["results"]}
+    failures = []
+    for result in results:
+        before = previous.get((result["case"], result["scale"]))
+        if before is None:
+            continue
+        label = f"{result['case']} @ {result['scale']}x"
+        if result["throughput"] < before["throughput"] * (1 - threshold):
+            failures.append(f"{label}: throughput {result['throughput']:,.0f} {result['unit']}/s "
+                            f"vs baseline {before['throughput']:,.0f}")
+        if (result["peak_mib"] > before["peak_mib"] * (1 + threshold)
+                and result["peak_mib"] - before["peak_mib"] > MEMORY_SLACK_MIB):
+            failures.append(f"{label}: peak memory {result['peak_mib']:.1f} MiB vs baseline {before['peak_mib']:.1f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline at several input sizes.")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES, help="multiples of each case's base size")
+    parser.add_argument("--only", nargs="+", default=None, help="run only cases whose name starts with one of these")
+    parser.add_argument("--repeat", type=int, default=3, help="minimum timed runs per case and scale")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline JSON")
+    parser.add_argument("--baseline", help="compare against this baseline JSON and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if not args.only or name.startswith(tuple(args.only))]
+    if not names:
+        parser.error(f"no case matches {args.only}; cases: {', '.join(CASES)}")
+
+    results = run_suite(names, args.scales, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as out:
+                json.dump(report, out, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            failures = regressions(results, json.load(baseline_file), args.threshold)
+        if failures:
+            print(f"\n{len(failures)} regression(s) beyond {args.threshold:.0%}:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
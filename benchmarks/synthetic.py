@@ -0,0 +1,88 @@
+# Synthetic inputs for every pipeline, deterministic for a given size and seed
+import numpy as np
+import pandas as pd
+
+STATES = ["New York", "California", "Florida"]
+RC_STATUSES = ["Quote Revision", "Final PA Review", "Released", "Planned", "Completed"]
+ACTIVITIES = ["Opening Meeting", "Document Review", "Process Walkthrough", "Closing Meeting", "Follow-up Review"]
+AUDIT_TYPES = ["IA", "P1", "P2", "P3", "P4", "P5", "RC"]
+
+
+# Same columns as the 50-row startup sample ML.py is used with; Profit is linear in the spends plus noise
+def startup_profits(n, seed=42):
+    rng = np.random.default_rng(seed)
+    rd = rng.uniform(0, 165_000, n)
+    admin = rng.uniform(50_000, 180_000, n)
+    marketing = rng.uniform(0, 470_000, n)
+    return pd.DataFrame({
+        "R&D Spend": rd,
+        "Administration": admin,
+        "Marketing Spend": marketing,
+        "State": rng.choice(STATES, n),
+        "Profit": 50_000 + 0.8 * rd - 0.02 * admin + 0.03 * marketing + rng.normal(0, 9_000, n),
+    })
+
+
+# An RC planning export with every REQUIRED_COLUMNS column plus an unused one, as parsed from Excel.
+# Date differences cover every category edge, negatives and missing validity dates.
+def rc_export(n, seed=42):
+    rng = np.random.default_rng(seed)
+    md_date = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    end_date = pd.Series(md_date + pd.to_timedelta(rng.integers(-60, 400, n), unit="D"))
+    end_date[rng.random(n) < 0.05] = pd.NaT
+    return pd.DataFrame({
+        "Customer Name": rng.choice([f"Customer {i}" for i in range(200)], n),
+        "Project Number": rng.integers(100_000, 100_000 + max(n // 4, 1), n),
+        "Standard Name": rng.choice(["ISO 9001", "ISO 14001", "ISO 45001", "IATF 16949"], n),
+        "Project Responsible": rng.choice([f"Responsible {i}" for i in range(40)], n),
+        "Project Planner": rng.choice([f"Planner {i}" for i in range(60)], n),
+        "Activity ID": rng.integers(1, 50, n),
+        "Project Status": rng.choice(RC_STATUSES, n),
+        "Split MD Date": md_date,
+        "Split Man-Days": rng.choice([0.5, 1.0, 1.5, 2.0, 3.0], n),
+        "Certificate Validity End Date": end_date,
+        "Comments": "",
+    })
+
+
+# (dataset, position, season) points stack like league_regression.load_tables returns, with every
+# third league two teams smaller (NaN padded)
+def points_tables(n_datasets, teams=20, seasons=15, seed=42):
+    rng = np.random.default_rng(seed)
+    strength = np.sort(rng.uniform(25, 95, (n_datasets, teams, 1)), axis=1)[:, ::-1]
+    values = np.clip(strength + rng.normal(0, 6, (n_datasets, teams, seasons)), 10, 100).round()
+    values[::3, teams - 2:] = np.nan
+    return values
+
+
+# (audit_data, site_auditor_info) as the store returns them. A share of the auditors works for every
+# site so bookings clash across sites; about 40% of each site's auditors are coded.
+def schedule_inputs(n_sites, audits_per_site=20, auditors_per_site=8, shared=0.25, seed=42):
+    rng = np.random.default_rng(seed)
+    pool = [f"Shared Auditor {i}" for i in range(max(1, int(auditors_per_site * shared)))]
+    audit_data = {}
+    site_auditor_info = {}
+
+    for s in range(n_sites):
+        site = f"Site {s}"
+        auditors = [f"Auditor {s}-{i}" for i in range(auditors_per_site - len(pool))] + pool
+        coded = [auditor for auditor in auditors if rng.random() < 0.4] or auditors[:1]
+        site_auditor_info[site] = {
+            "auditors": auditors,
+            "coded_auditors": coded,
+            "availability": {auditor: float(rng.choice([5, 10, 20, 40])) for auditor in auditors},
+        }
+
+        audits = []
+        for _ in range(audits_per_site):
+            activities = [activity for activity in ACTIVITIES if rng.random() < 0.7] or ACTIVITIES[:1]
+            audits.append({
+                "Audit Type": str(rng.choice(AUDIT_TYPES)),
+                "Proposed Date": (pd.Timestamp("2026-01-05") + pd.Timedelta(days=int(rng.integers(0, 250)))).strftime("%Y-%m-%d"),
+                "Activities": {activity: "✔️" for activity in activities},
+                "Durations": {activity: int(rng.choice([30, 60, 90, 120, 240])) for activity in activities},
+                "Core Status": {activity: str(rng.choice(["Core", "Non-Core"])) for activity in activities},
+            })
+        audit_data[site] = audits
+
+    return audit_data, site_auditor_info
@@ -0,0 +1,75 @@
+import importlib
+import sys
+import threading
+import time
+
+# Seconds spent importing each module through this layer, in this process
+_import_times = {}
+_lock = threading.Lock()
+
+
+# Always goes through import_module, which waits on the module's import lock: a module that the
+# warming thread is still importing is already in sys.modules but not yet fully initialized
+def timed_import(name):
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded:
+        with _lock:
+            _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access, so the cost is paid
+    # by the page section that uses it instead of at script start.
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def import_times():
+    with _lock:
+        return dict(_import_times)
+
+
+def _start_warming(names):
+    def warm():
+        for name in names:
+            try:
+                timed_import(name)
+            except ImportError:
+                pass
+
+    thread = threading.Thread(target=warm, name="warm-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+_warm_once = None
+
+
+# Import heavy modules on a background thread, once per server process (st.cache_resource).
+# Call it near the top of a script: the imports then overlap with the rest of the run and with the
+# user picking a file, and the page section that needs them usually finds them loaded.
+# Streamlit itself is only needed here, not for lazy_import.
+def warm_imports(names):
+    global _warm_once
+    if _warm_once is None:
+        import streamlit as st
+        _warm_once = st.cache_resource(show_spinner=False)(_start_warming)
+    return _warm_once(tuple(names))
@@ -0,0 +1,165 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# One row per (site, audit, activity). "Audit" numbers the audits of a site; without it, each
+# (Site, Audit Type, Proposed Date, Mandays) combination is one audit. Core Status defaults to
+# Non-Core and Selected to yes.
+REQUIRED_COLUMNS = ["Site", "Audit Type", "Proposed Date", "Mandays", "Activity"]
+OPTIONAL_COLUMNS = ["Audit", "Core Status", "Selected"]
+
+CORE_VALUES = {"core": "Core", "non-core": "Non-Core", "yes": "Core", "no": "Non-Core",
+               "true": "Core", "false": "Non-Core", "1": "Core", "0": "Non-Core"}
+SELECTED_VALUES = {"✔️": True, "✖️": False, "yes": True, "no": False, "true": True, "false": False,
+                   "1": True, "0": False, "y": True, "n": False, "x": True, "": True}
+
+TEMPLATE = pd.DataFrame({
+    "Site": ["Plant A", "Plant A", "Plant A", "Plant B"],
+    "Audit": [1, 1, 2, 1],
+    "Audit Type": ["IA", "IA", "P1", "RC"],
+    "Proposed Date": ["2025-01-15", "2025-01-15", "2025-06-10", "2025-03-01"],
+    "Mandays": [2, 2, 1, 3],
+    "Activity": ["Opening Meeting", "Document Review", "Opening Meeting", "Opening Meeting"],
+    "Core Status": ["Core", "Non-Core", "Core", "Non-Core"],
+    "Selected": ["yes", "yes", "yes", "yes"],
+})
+
+
+def read_bulk_file(name, data):
+    if name.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(BytesIO(data), dtype=str)
+    return pd.read_csv(BytesIO(data), dtype=str, keep_default_na=False)
+
+
+def _rows_message(mask, message):
+    rows = np.flatnonzero(mask.to_numpy()) + 2  # +1 for the header, +1 for 1-based rows
+    shown = ", ".join(map(str, rows[:5])) + (", ..." if len(rows) > 5 else "")
+    return f"{message} ({len(rows)} rows: {shown})"
+
+
+# Normalize and validate the whole upload with column-wise checks.
+# Returns (normalized frame, list of error messages); the frame is None when there are errors.
+@timed("Validate bulk upload", rows=lambda result: None if result[0] is None else len(result[0]))
+def validate_bulk(raw):
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in raw.columns]
+    if missing_columns:
+        return None, [f"Missing columns: {', '.join(missing_columns)}"]
+
+    df = pd.DataFrame({col: raw[col].fillna("").astype(str).str.strip() for col in REQUIRED_COLUMNS})
+    errors = []
+
+    for col in ["Site", "Audit Type", "Activity"]:
+        if (df[col] == "").any():
+            errors.append(_rows_message(df[col] == "", f"Empty {col}"))
+
+    dates = pd.to_datetime(df["Proposed Date"], errors="coerce", format="mixed")
+    if dates.isna().any():
+        errors.append(_rows_message(dates.isna(), "Invalid Proposed Date"))
+    df["Proposed Date"] = dates.dt.strftime("%Y-%m-%d")
+
+    mandays = pd.to_numeric(df["Mandays"], errors="coerce")
+    bad_mandays = mandays.isna() | (mandays < 1) | (mandays % 1 != 0)
+    if bad_mandays.any():
+        errors.append(_rows_message(bad_mandays, "Mandays must be a whole number of at least 1"))
+    df["Mandays"] = mandays.fillna(0).astype(int)
+
+    if "Core Status" in raw.columns:
+        # Empty cells (read as "" from CSV) default to Non-Core like missing ones
+        core = raw["Core Status"].fillna("").astype(str).str.strip().str.lower()
+        core = core.where(core != "", "non-core")
+    else:
+        core = pd.Series("non-core", index=raw.index)
+    df["Core Status"] = core.map(CORE_VALUES)
+    if df["Core Status"].isna().any():
+        errors.append(_rows_message(df["Core Status"].isna(), "Core Status must be Core or Non-Core"))
+
+    if "Selected" in raw.columns:
+        selected = raw["Selected"].fillna("").astype(str).str.strip().str.lower()
+    else:
+        selected = pd.Series("", index=raw.index)
+    df["Selected"] = selected.map(SELECTED_VALUES)
+    if df["Selected"].isna().any():
+        errors.append(_rows_message(df["Selected"].isna(), "Selected must be yes/no"))
+
+    if "Audit" in raw.columns:
+        df["Audit"] = raw["Audit"].fillna("").astype(str).str.strip()
+    else:
+        df["Audit"] = df.groupby(["Site", "Audit Type", "Proposed Date", "Mandays"], sort=False).ngroup().astype(str)
+
+    # Every site becomes a sheet named after its first 31 characters (Excel's limit)
+    site_names = pd.Series(df["Site"].unique())
+    clashing = site_names[site_names.str[:31].duplicated(keep=False)]
+    if len(clashing):
+        errors.append(_rows_message(df["Site"].isin(clashing), "Site names must differ within their first 31 characters"))
+
+    # An activity is Core or Non-Core for the whole site
+    core_per_activity = df.groupby(["Site", "Activity"])["Core Status"].transform("nunique")
+    if (core_per_activity > 1).any():
+        errors.append(_rows_message(core_per_activity > 1, "Activity has different Core Status within the same site"))
+
+    # Audit-level fields must agree on every row of the same audit
+    audit_keys = ["Site", "Audit"]
+    for col in ["Audit Type", "Proposed Date", "Mandays"]:
+        inconsistent = df.groupby(audit_keys)[col].transform("nunique") > 1
+        if inconsistent.any():
+            errors.append(_rows_message(inconsistent, f"Rows of the same audit have different {col}"))
+
+    duplicated = df.duplicated(audit_keys + ["Activity"], keep=False)
+    if duplicated.any():
+        errors.append(_rows_message(duplicated, "Activity listed twice for the same audit"))
+
+    return (None, errors) if errors else (df, [])
+
+
+# {site: frame} in the same layout the form produces: Audit Type, Proposed Date, Mandays, then
+# "<activity>" (✔️/✖️) and "<activity> (Core Status)" for every activity of the site.
+# Every site's audit x activity grid is filled by one scatter into a flat array, so the per-site
+# work is only slicing and building the frame.
+@timed("Build site sheets", rows=len)
+def build_site_frames(df):
+    site_code, sites = pd.factorize(df["Site"])
+    n_sites = len(sites)
+
+    # Audits and site activities in order of first appearance, then grouped by site (stable)
+    first_audit = ~df.duplicated(["Site", "Audit"]).to_numpy()
+    first_activity = ~df.duplicated(["Site", "Activity"]).to_numpy()
+    audit_order = np.argsort(site_code[first_audit], kind="stable")
+    activity_order = np.argsort(site_code[first_activity], kind="stable")
+    audits = df.loc[first_audit, ["Audit Type", "Proposed Date", "Mandays"]].iloc[audit_order].reset_index(drop=True)
+    activities = df.loc[first_activity, ["Activity", "Core Status"]].iloc[activity_order].reset_index(drop=True)
+
+    n_audits = np.bincount(site_code[first_audit], minlength=n_sites)
+    n_activities = np.bincount(site_code[first_activity], minlength=n_sites)
+    audit_start = np.concatenate([[0], np.cumsum(n_audits)])
+    activity_start = np.concatenate([[0], np.cumsum(n_activities)])
+    grid_start = np.concatenate([[0], np.cumsum(n_audits * n_activities)])
+
+    # Position of every row's audit / activity within its site
+    audit_rank = np.empty(first_audit.sum(), dtype=np.int64)
+    audit_rank[audit_order] = np.arange(len(audit_order)) - audit_start[site_code[first_audit][audit_order]]
+    activity_rank = np.empty(first_activity.sum(), dtype=np.int64)
+    activity_rank[activity_order] = np.arange(len(activity_order)) - activity_start[site_code[first_activity][activity_order]]
+    row_audit = audit_rank[df.groupby(["Site", "Audit"], sort=False).ngroup().to_numpy()]
+    row_activity = activity_rank[df.groupby(["Site", "Activity"], sort=False).ngroup().to_numpy()]
+
+    selected = np.zeros(grid_start[-1], dtype=bool)
+    selected[grid_start[site_code] + row_audit * n_activities[site_code] + row_activity] = df["Selected"].to_numpy(dtype=bool)
+    marks = np.where(selected, "✔️", "✖️")
+
+    audit_columns = {col: audits[col].to_numpy() for col in audits.columns}
+    activity_names = activities["Activity"].to_numpy()
+    activity_core = activities["Core Status"].to_numpy()
+
+    frames = {}
+    for s, site in enumerate(sites):
+        columns = {col: values[audit_start[s]:audit_start[s + 1]] for col, values in audit_columns.items()}
+        grid = marks[grid_start[s]:grid_start[s + 1]].reshape(n_audits[s], n_activities[s])
+        for i in range(n_activities[s]):
+            activity = activity_names[activity_start[s] + i]
+            columns[activity] = grid[:, i]
+            columns[f"{activity} (Core Status)"] = np.full(n_audits[s], activity_core[activity_start[s] + i], dtype=object)
+        frames[site] = pd.DataFrame(columns)
+    return frames
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from bootstrap import lazy_import
+
+# Streamlit is only needed by the widgets at the bottom; the rest runs anywhere (e.g. the benchmarks)
+st = lazy_import("streamlit")
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+# Points drawn per line chart; LTTB keeps the visible shape of far longer series at this size
+MAX_CHART_POINTS = 2_000
+
+# Stacks per bar chart; smaller groups are summed into one "Other" stack
+MAX_CHART_GROUPS = 20
+
+# Calendar events sent to the browser at once, after the date window is applied
+MAX_CALENDAR_EVENTS = 2_000
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return values.astype(float)
+
+
+# Largest-Triangle-Three-Buckets: positions of `threshold` points of the line (x, y) that keep its
+# visual shape. The first and last points are kept; every bucket in between contributes the point
+# forming the largest triangle with the previously kept point and the next bucket's average.
+# Points with a missing x or y are never picked. x must be sorted.
+def lttb(x, y, threshold=MAX_CHART_POINTS):
+    x, y = _as_float(x), _as_float(y)
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if threshold >= len(valid) or threshold < 3:
+        return valid
+    x, y = x[valid], y[valid]
+    n = len(x)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return valid[selected]
+
+
+# Rows of `df` to draw for the `y` lines against `x` (a column, or the index when None): the union of
+# every line's LTTB points, so each line keeps its own peaks
+def downsample(df, y, x=None, max_points=MAX_CHART_POINTS):
+    if len(df) <= max_points:
+        return df
+    x_values = df.index.to_numpy() if x is None else df[x].to_numpy()
+    keep = np.unique(np.concatenate([lttb(x_values, df[col].to_numpy(), max_points) for col in y]))
+    return df.iloc[keep]
+
+
+# `df` with only the `max_groups - 1` values of `column` that have the largest `value` total; the
+# rest are relabelled `other` and `value` is summed again per `by` + `column`
+def limit_groups(df, column, value, by, max_groups=MAX_CHART_GROUPS, other="Other"):
+    totals = df.groupby(column, observed=True)[value].sum()
+    if len(totals) <= max_groups:
+        return df
+    keep = totals.nlargest(max_groups - 1).index
+    labels = df[column].astype(object).where(df[column].isin(keep), other)
+    return df.assign(**{column: labels}).groupby(by + [column], observed=True, as_index=False)[value].sum()
+
+
+# Rows whose text columns contain `text` (case-insensitive) and whose columns hold one of the allowed
+# values in `filters` ({column: values}; a tuple of columns matches when any of them does). Categorical
+# columns are searched through their categories, so the cost does not grow with repeated values.
+def filter_frame(df, text=None, filters=None):
+    mask = np.ones(len(df), dtype=bool)
+    for columns, values in (filters or {}).items():
+        if values:
+            columns = columns if isinstance(columns, tuple) else (columns,)
+            mask &= np.logical_or.reduce([df[col].isin(list(values)).to_numpy() for col in columns])
+
+    text = (text or "").strip()
+    if text:
+        found = np.zeros(len(df), dtype=bool)
+        for col in df.columns:
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                hits = column.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+                found |= np.append(hits, False)[column.cat.codes.to_numpy()]
+            elif column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+                found |= column.astype(str).str.contains(text, case=False, regex=False).fillna(False).to_numpy(dtype=bool)
+        mask &= found
+    return df[mask]
+
+
+# Rows on a date column within [start, start + days)
+def date_window(dates, start, days):
+    start = pd.Timestamp(start)
+    dates = pd.Series(dates)
+    return ((dates >= start) & (dates < start + pd.Timedelta(days=days))).to_numpy()
+
+
+def page_bounds(total, page, page_size):
+    pages = max(1, -(-total // page_size))
+    page = min(max(int(page), 1), pages)
+    return (page - 1) * page_size, min(page * page_size, total)
+
+
+# ---------- Streamlit widgets ----------
+
+def search_box(key, container=None):
+    return (container or st).text_input("Filter rows", key=f"{key}_search", placeholder="Search text columns")
+
+
+# Page-size and page pickers for `total` rows; returns the (start, stop) positions of the page
+def pager(total, key, page_sizes=PAGE_SIZES):
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    page_size = size_col.selectbox("Rows per page", page_sizes, key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+    # A filter can leave fewer pages than the page last shown
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start, stop = page_bounds(total, page, page_size)
+    info_col.caption(f"Rows {start + 1 if total else 0:,}–{stop:,} of {total:,} ({pages:,} pages)")
+    return start, stop
+
+
+# st.dataframe of one page of `df` with a text filter; only that page is sent to the browser
+def paged_dataframe(df, key, page_sizes=PAGE_SIZES):
+    view = filter_frame(df, search_box(key))
+    start, stop = pager(len(view), key, page_sizes)
+    if len(view) != len(df):
+        st.caption(f"{len(view):,} of {len(df):,} rows match the filter")
+    st.dataframe(view.iloc[start:stop])
+    return view
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import xlsxwriter
+
+from instrumentation import background_run, timed
+
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/octet-stream", ".parquet"),
+}
+
+# Rows converted to Python values at a time; bounds the extra memory used while writing
+CHUNK_ROWS = 50_000
+
+
+# Rows of `df` as tuples of plain Python values, with every missing value turned into None
+def _iter_rows(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        block = df.iloc[start:start + chunk_rows]
+        columns = []
+        for name in block.columns:
+            values = block[name].to_numpy(dtype=object, copy=True)
+            values[pd.isna(values)] = None
+            columns.append(values)
+        yield from zip(*columns)
+
+
+# Write {sheet name: DataFrame} with xlsxwriter's constant_memory mode: each row is flushed to a
+# temporary file as soon as the next one starts, so memory stays flat for any number of rows.
+# (pandas' ExcelWriter writes cells column by column, which constant_memory cannot handle.)
+def write_excel(sheets, target):
+    workbook = xlsxwriter.Workbook(target, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+        "nan_inf_to_errors": True,
+    })
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    try:
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name[:31])
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+            for row, values in enumerate(_iter_rows(df), start=1):
+                worksheet.write_row(row, 0, values)
+    finally:
+        workbook.close()
+
+
+# CSV and Parquet hold one table, so only the first sheet is written
+def write_csv(sheets, target):
+    df = next(iter(sheets.values()))
+    with open(target, "w", newline="", encoding="utf-8") as out:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            df.iloc[start:start + CHUNK_ROWS].to_csv(out, index=False, header=(start == 0))
+
+
+def write_parquet(sheets, target):
+    next(iter(sheets.values())).to_parquet(target, index=False)
+
+
+WRITERS = {"xlsx": write_excel, "csv": write_csv, "parquet": write_parquet}
+
+
+@timed("Write export file")
+def export_file(sheets, fmt="xlsx"):
+    _, suffix = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        WRITERS[fmt](sheets, path)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+
+class ExportCache:
+    # Exported files on disk keyed by (name, data version, format). Files are only generated when a
+    # download is requested and are reused until the data version changes; old ones are deleted.
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._paths = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_path(self, key, build_sheets, fmt):
+        with self._lock:
+            path = self._paths.get(key)
+            if path and os.path.exists(path):
+                self._paths.move_to_end(key)
+                return path
+
+        path = export_file(build_sheets(), fmt)
+        with self._lock:
+            self._paths[key] = path
+            while len(self._paths) > self.max_entries:
+                _, old_path = self._paths.popitem(last=False)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+        return path
+
+
+_export_cache = ExportCache()
+
+
+# A zero-argument callable for st.download_button(data=...): Streamlit only runs it when the button
+# is clicked. `build_sheets` returns {sheet name: DataFrame}; `version` must change with the data.
+def lazy_download(name, version, build_sheets, fmt="xlsx"):
+    def generate():
+        # Runs on click, outside the script run, so it is recorded as background work
+        with background_run(f"Export {name} ({fmt})"):
+            path = _export_cache.get_path((name, version, fmt), build_sheets, fmt)
+        with open(path, "rb") as exported:
+            return exported.read()
+    return generate
+
+
+# The same for a file that is already on disk (e.g. a batch-scored CSV): it is only read on click
+def lazy_file_download(path, name):
+    def generate():
+        with background_run(f"Download {name}"):
+            with open(path, "rb") as stored:
+                return stored.read()
+    return generate
+
+
+# Content hash of {sheet name: DataFrame}, for data that has no version counter of its own
+def frames_version(sheets):
+    digest = hashlib.sha256()
+    for sheet_name, df in sheets.items():
+        digest.update(f"{sheet_name}|{'|'.join(map(str, df.columns))}".encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][0]
+
+
+def export_file_name(stem, fmt):
+    return stem + EXPORT_FORMATS[fmt][1]
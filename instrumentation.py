@@ -0,0 +1,237 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# The rerun being recorded on this thread. Streamlit runs each session's script on its own thread,
+# so concurrent sessions never see each other's stages; without a rerun every stage is a no-op.
+_local = threading.local()
+
+PROFILERS = ["cProfile", "pyinstrument"]
+
+# Work that runs outside a script run (download callbacks, background jobs), shared by all sessions
+_background = deque(maxlen=50)
+_background_lock = threading.Lock()
+
+# tracemalloc is process-wide: it runs while any rerun tracks memory and is stopped by the last one
+# (unless something else had started it), and its single peak is only per rerun when no other rerun
+# overlapped. "started" counts every rerun ever begun, so a rerun can tell whether others began meanwhile.
+_process = {"active": 0, "started": 0, "tracing": 0, "owns_tracemalloc": False}
+_process_lock = threading.Lock()
+
+
+class Rerun:
+    # Stages recorded during one script run: wall time, peak traced memory and row counts.
+    # Memory is only measured when tracemalloc is on, since tracing slows allocation-heavy code.
+
+    def __init__(self, app, track_memory=False, profiler=None):
+        self.app = app
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.track_memory = track_memory
+        self.profiler = profiler
+        self.stages = []
+        self.wall = None
+        self.peak_kb = None
+        self.profile = None
+        self._stack = []
+        self._start = time.perf_counter()
+        self._tracing = False
+        self._overlapped = False
+        self._started_mark = None
+        self._profile = None
+        self.memory_note = None
+
+    def _memory_on(self):
+        return self.track_memory and tracemalloc.is_tracing()
+
+    # A stage's peak is the traced peak since it started. tracemalloc keeps a single peak, so when a
+    # nested stage resets it the enclosing stages keep the running maximum themselves.
+    def open_stage(self, name, rows=None):
+        record = {"stage": name, "depth": len(self._stack), "rows": rows, "wall": None, "peak_kb": None}
+        frame = {"record": record, "start": time.perf_counter(), "current": 0, "peak": 0}
+        if self._memory_on():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["current"] = frame["peak"] = current
+        self.stages.append(record)
+        self._stack.append(frame)
+        return record
+
+    def close_stage(self):
+        frame = self._stack.pop()
+        record = frame["record"]
+        record["wall"] = time.perf_counter() - frame["start"]
+        if self._memory_on():
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            record["peak_kb"] = round((peak - frame["current"]) / 1024, 1)
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+    def start(self):
+        with _process_lock:
+            self._overlapped = _process["active"] > 0
+            _process["active"] += 1
+            _process["started"] += 1
+            self._started_mark = _process["started"]
+            if self.track_memory:
+                if _process["tracing"] == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _process["owns_tracemalloc"] = True
+                _process["tracing"] += 1
+                self._tracing = True
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                self.profile = "pyinstrument is not installed; captured with cProfile instead."
+                self.profiler = "cProfile"
+            else:
+                self._profile = Profiler()
+                self._profile.start()
+        if self.profiler == "cProfile":
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as e:  # another profiler is already active in this process
+                self.profile = f"Profiling skipped: {e}"
+                self._profile = None
+        self._start = time.perf_counter()
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._start
+        while self._stack:
+            self.close_stage()
+        if self._memory_on():
+            self.peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        with _process_lock:
+            _process["active"] -= 1
+            self._overlapped = self._overlapped or _process["started"] != self._started_mark
+            if self._tracing:
+                _process["tracing"] -= 1
+                if _process["tracing"] == 0 and _process["owns_tracemalloc"]:
+                    tracemalloc.stop()
+                    _process["owns_tracemalloc"] = False
+                self._tracing = False
+        if self.track_memory and self._overlapped:
+            # Other reruns allocated (and reset the peak) at the same time, so the peaks are not this rerun's
+            self.peak_kb = None
+            for record in self.stages:
+                record["peak_kb"] = None
+            self.memory_note = "Peak memory not shown: other sessions ran at the same time and tracemalloc keeps one peak per process."
+
+        if self._profile is None:
+            return
+        if isinstance(self._profile, cProfile.Profile):
+            self._profile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(40)
+            report = out.getvalue()
+        else:
+            self._profile.stop()
+            report = self._profile.output_text(unicode=True, color=False)
+        self.profile = f"{self.profile}\n\n{report}" if self.profile else report
+        self._profile = None
+
+    def as_dict(self):
+        return {
+            "app": self.app,
+            "started_at": self.started_at,
+            "wall": self.wall,
+            "peak_kb": self.peak_kb,
+            "memory_note": self.memory_note,
+            "profiler": self.profiler,
+            "stages": self.stages,
+            "profile": self.profile,
+        }
+
+
+def current_rerun():
+    return getattr(_local, "rerun", None)
+
+
+def begin_rerun(app, track_memory=False, profiler=None):
+    rerun = Rerun(app, track_memory=track_memory, profiler=profiler)
+    _local.rerun = rerun
+    rerun.start()
+    return rerun
+
+
+def end_rerun():
+    rerun = current_rerun()
+    _local.rerun = None
+    if rerun is not None:
+        rerun.finish()
+    return rerun
+
+
+# with stage("Parse CSV") as s: ...; s["rows"] = len(df)
+@contextmanager
+def stage(name, rows=None):
+    rerun = current_rerun()
+    if rerun is None:
+        yield {"stage": name, "rows": rows}
+        return
+    record = rerun.open_stage(name, rows)
+    try:
+        yield record
+    finally:
+        rerun.close_stage()
+
+
+# @timed("Categorize", rows=len): `rows` turns the return value into a row count
+def timed(name, rows=None):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_rerun() is None:
+                return func(*args, **kwargs)
+            with stage(name) as record:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    record["rows"] = rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+# Records the block as its own run when no script run is active on this thread (e.g. a download
+# callback), otherwise as a stage of the current run
+@contextmanager
+def background_run(name):
+    if current_rerun() is not None:
+        with stage(name) as record:
+            yield record
+        return
+    rerun = begin_rerun(name)
+    try:
+        with stage(name) as record:
+            yield record
+    finally:
+        end_rerun()
+        add_background_run(rerun)
+
+
+# Also for runs recorded elsewhere and handed back, like a job's run in a worker process
+def add_background_run(rerun):
+    with _background_lock:
+        _background.append(rerun)
+
+
+def background_runs():
+    with _background_lock:
+        return list(_background)
+
+
+def reruns_to_json(reruns):
+    return json.dumps([rerun.as_dict() for rerun in reruns], indent=2, default=str)
@@ -0,0 +1,123 @@
+import bisect
+import numbers
+
+from instrumentation import timed
+
+
+class IntervalIndex:
+    # Half-open [start, end) intervals in minutes, kept sorted by start in one list per key, with the
+    # running maximum of their ends. Keys are (auditor, date), so every list only holds one auditor's day.
+    # A lookup bisects the starts for the last candidate and the running maximum for the first, so
+    # when the stored intervals do not overlap each other (a clash-free day) it only visits the hits.
+
+    def __init__(self):
+        self._starts = {}
+        self._intervals = {}
+        self._max_ends = {}
+
+    # Running maximum of the ends from position i on; inserts and deletes shift the list anyway
+    def _update_max_ends(self, key, i):
+        intervals = self._intervals[key]
+        max_ends = self._max_ends[key]
+        running = max_ends[i - 1] if i > 0 else None
+        for j in range(i, len(intervals)):
+            end = intervals[j][1]
+            running = end if running is None else max(running, end)
+            max_ends[j] = running
+
+    def add(self, key, start, end, item=None):
+        starts = self._starts.setdefault(key, [])
+        i = bisect.bisect_right(starts, start)
+        starts.insert(i, start)
+        self._intervals.setdefault(key, []).insert(i, (start, end, item))
+        self._max_ends.setdefault(key, []).insert(i, end)
+        self._update_max_ends(key, i)
+
+    def remove(self, key, start, end, item=None):
+        starts = self._starts.get(key)
+        if not starts:
+            return False
+        intervals = self._intervals[key]
+        for i in range(bisect.bisect_left(starts, start), bisect.bisect_right(starts, start)):
+            if intervals[i] == (start, end, item):
+                del starts[i]
+                del intervals[i]
+                del self._max_ends[key][i]
+                self._update_max_ends(key, i)
+                return True
+        return False
+
+    # Every stored interval of `key` that overlaps [start, end): those starting before `end`, from
+    # the first one whose running maximum end passes `start`
+    def overlapping(self, key, start, end):
+        starts = self._starts.get(key)
+        if not starts:
+            return []
+        last = bisect.bisect_left(starts, end)
+        first = bisect.bisect_right(self._max_ends[key], start, 0, last)
+        return [iv for iv in self._intervals[key][first:last] if iv[1] > start]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+
+class BookingIndex:
+    # Auditor bookings of a schedule, row by row, with the set of rows each row clashes with.
+    # Editing one row only touches that row's auditor days, and a conflict check is a few bisects
+    # there (see IntervalIndex.overlapping).
+
+    def __init__(self):
+        self.index = IntervalIndex()
+        self._bookings = {}
+        self._conflicts = {}
+
+    @classmethod
+    @timed("Build booking index")
+    def from_schedule(cls, schedule_df):
+        bookings = cls()
+        columns = ["Proposed Date", "Start Time", "End Time", "Auditor 1", "Auditor 2"]
+        for row_id, day, start, end, auditor_1, auditor_2 in schedule_df[columns].itertuples(name=None):
+            bookings.update(row_id, day, start, end, [auditor_1, auditor_2])
+        return bookings
+
+    def _remove(self, row_id):
+        for key, start, end in self._bookings.pop(row_id, []):
+            self.index.remove(key, start, end, row_id)
+        for other in self._conflicts.pop(row_id, set()):
+            self._conflicts[other].discard(row_id)
+
+    # (Re)book a row; returns the ids whose conflict status may have changed
+    def update(self, row_id, day, start, end, auditors):
+        touched = {row_id} | self._conflicts.get(row_id, set())
+        self._remove(row_id)
+
+        start, end = _to_minutes(start), _to_minutes(end)
+        bookings = []
+        clashes = set()
+        # A missing date (NaT is the only value not equal to itself) books nothing
+        if start is not None and end is not None and end > start and day == day:
+            for auditor in dict.fromkeys(a for a in auditors if isinstance(a, str) and a):
+                key = (auditor, str(day))
+                clashes.update(iv[2] for iv in self.index.overlapping(key, start, end))
+                self.index.add(key, start, end, row_id)
+                bookings.append((key, start, end))
+
+        self._bookings[row_id] = bookings
+        self._conflicts[row_id] = clashes
+        for other in clashes:
+            self._conflicts[other].add(row_id)
+        return touched | clashes
+
+    def conflicting_rows(self):
+        return {row_id for row_id, others in self._conflicts.items() if others}
+
+
+# Minutes from midnight, from the compact schedule's integers or "HH:MM" text
+def _to_minutes(value):
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    try:
+        hours, minutes = str(value).split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
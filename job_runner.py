@@ -0,0 +1,239 @@
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from uuid import uuid4
+
+from instrumentation import add_background_run, begin_rerun, end_rerun
+
+# Finished jobs kept for dedupe and for handles still held by sessions
+KEEP_FINISHED = 200
+
+# Progress messages of running jobs go to the runner's queue; set per task in the worker
+_progress = {"queue": None}
+_local = threading.local()
+
+
+# Stable hash of any JSON-like inputs (dicts are hashed with sorted keys), used to dedupe submissions
+def input_hash(*parts):
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Called by a task (in the worker) to report how far it is; a no-op outside a job
+def report_progress(fraction, message=None):
+    job_id = getattr(_local, "job_id", None)
+    if job_id is not None and _progress["queue"] is not None:
+        _progress["queue"].put((job_id, fraction, message))
+
+
+# Streamlit installs the running page script as __main__, and spawned workers import __main__ on
+# start-up, so they would run the whole page. Worker processes are only started inside
+# executor.submit, so a process-pool submission runs with a bare __main__ in place. sys.modules is
+# process-wide, hence the lock: two sessions submitting at once must not restore each other's swap.
+_worker_main = types.ModuleType("__main__")
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def _bare_main():
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = _worker_main
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+def _import_modules(names):
+    for name in names:
+        importlib.import_module(name)
+
+
+def _init_worker(progress_queue):
+    _progress["queue"] = progress_queue
+
+
+# The task is recorded as a run of its own, so its @timed stages are kept even in a worker process
+# (where no script run is active); the record is returned with the result as (result, rerun)
+def _run(job_id, name, func, args, kwargs):
+    _local.job_id = job_id
+    rerun = begin_rerun(name)
+    try:
+        report_progress(0.0, "Running")
+        result = func(*args, **kwargs)
+    finally:
+        end_rerun()
+        _local.job_id = None
+    return result, rerun
+
+
+class Job:
+    # Handle of one submitted task. Sessions keep only the id in session_state and look the job up
+    # on every rerun, so the handle survives reruns and is shared by identical submissions.
+
+    def __init__(self, name, key):
+        self.id = uuid4().hex
+        self.name = name
+        self.key = key
+        self.progress = 0.0
+        self.message = "Queued"
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    @property
+    def failed(self):
+        return self.done and (self.future.cancelled() or self.future.exception() is not None)
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.submitted_at
+
+    def result(self):
+        return self.future.result()[0]
+
+    # Stage timings of the task as recorded where it ran (an instrumentation.Rerun)
+    def rerun(self):
+        return self.future.result()[1] if self.done and not self.failed else None
+
+    def error(self):
+        if not self.done:
+            return None
+        return CancelledError("The job was cancelled") if self.future.cancelled() else self.future.exception()
+
+
+class JobRunner:
+    # Runs long tasks (schedule generation, model fits) on a process pool so the script thread that
+    # submitted them returns at once and the page polls for the result. Submissions with the same key
+    # (an input_hash of the task's inputs) share one job while it runs and reuse its result after.
+    # Tasks and their arguments must be picklable; set JOB_EXECUTOR=thread to use threads instead.
+    # One instance is shared by every session through st.cache_resource, hence the lock.
+
+    def __init__(self, max_workers=None, executor=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.kind = executor or os.environ.get("JOB_EXECUTOR", "process")
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queue = None
+        self._drain_thread = None
+
+    # Workers are spawned rather than forked, since the server process runs many threads
+    def _start_executor(self):
+        if self.kind == "process":
+            context = multiprocessing.get_context("spawn")
+            self._queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=context, initializer=_init_worker, initargs=(self._queue,)
+            )
+        else:
+            self._queue = queue.Queue()
+            _init_worker(self._queue)
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="job")
+        self._drain_thread = threading.Thread(target=self._drain, args=(self._queue,), name="job-progress", daemon=True)
+        self._drain_thread.start()
+
+    # After a worker died: the old pool and its progress thread are stopped, then a fresh pool started
+    def _restart_executor(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue.put(None)
+        self._drain_thread.join(timeout=5)
+        self._start_executor()
+
+    def _submit_task(self, func, *args):
+        if self.kind != "process":
+            return self._executor.submit(func, *args)
+        with _bare_main():
+            return self._executor.submit(func, *args)
+
+    # Starts the workers and imports `modules` in them ahead of the first real job
+    def warm(self, modules):
+        with self._lock:
+            if self._executor is None:
+                self._start_executor()
+            for _ in range(self.max_workers):
+                self._submit_task(_import_modules, list(modules))
+
+    # Applies progress messages until the None that _restart_executor sends
+    def _drain(self, progress_queue):
+        while True:
+            item = progress_queue.get()
+            if item is None:
+                return
+            job_id, fraction, message = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None and not job.done:
+                job.progress = max(0.0, min(float(fraction), 1.0))
+                job.message = message or job.message
+
+    # Finished tasks show up with their stages among the panel's background runs and in its export
+    def _finished(self, job):
+        job.finished_at = time.time()
+        job.progress = 1.0
+        job.message = "Failed" if job.failed else "Done"
+        if job.rerun() is not None:
+            add_background_run(job.rerun())
+
+    def submit(self, func, *args, name=None, key=None, **kwargs):
+        with self._lock:
+            if key is not None and key in self._by_key:
+                job = self._jobs.get(self._by_key[key])
+                if job is not None and not job.failed:
+                    self._jobs.move_to_end(job.id)
+                    return job
+
+            if self._executor is None:
+                self._start_executor()
+            job = Job(name or getattr(func, "__name__", "job"), key)
+            try:
+                job.future = self._submit_task(_run, job.id, job.name, func, args, kwargs)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool for this and later jobs
+                self._restart_executor()
+                job.future = self._submit_task(_run, job.id, job.name, func, args, kwargs)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._prune()
+
+        job.future.add_done_callback(lambda _: self._finished(job))
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Waits up to `timeout` seconds, so quick jobs finish within the rerun that submitted them
+    def wait(self, job, timeout):
+        wait_futures([job.future], timeout=timeout)
+        return job.done
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import lazy_import
+
+# matplotlib is only imported when something is plotted
+plt = lazy_import("matplotlib.pyplot")
+
+
+# Points tables (one column per season, one row per final position) from many CSVs in one pass,
+# stacked into a (dataset, row, season) array. Returns (dataset names, seasons, values).
+def load_tables(paths, names=None):
+    frames = [pd.read_csv(path) for path in paths]
+    if names is None:
+        names = [os.path.splitext(os.path.basename(str(path)))[0] for path in paths]
+    seasons = sorted({str(col) for df in frames for col in df.columns})
+    return list(names), seasons, stack_tables(frames, seasons)
+
+
+# Leagues with fewer teams or missing seasons are padded with NaN
+def stack_tables(frames, seasons):
+    values = np.full((len(frames), max(len(df) for df in frames), len(seasons)), np.nan)
+    position = {season: i for i, season in enumerate(seasons)}
+    for d, df in enumerate(frames):
+        columns = [position[str(col)] for col in df.columns]
+        values[d, :len(df)][:, columns] = df.to_numpy(dtype=float)
+    return values
+
+
+# OLS fit y = slope * x + intercept for every ordered pair of columns (x = column i, y = column j)
+# of `values` (..., row, column), all at once. Each pair uses the rows where both columns are
+# present. The sums of the 2x2 normal equations for every pair come from four einsums, and the
+# batched solve is written out in closed form so a constant column gives NaN instead of an error.
+# Returns slope, intercept, r2 and n, each shaped (..., column, column).
+def pairwise_ols(values):
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    m = present.astype(float)
+
+    n = np.einsum("...ri,...rj->...ij", m, m)
+    sx = np.einsum("...ri,...rj->...ij", x, m)  # sum of column i over rows where j is present
+    sxx = np.einsum("...ri,...rj->...ij", x * x, m)
+    sxy = np.einsum("...ri,...rj->...ij", x, x)
+    sy = np.swapaxes(sx, -1, -2)
+    syy = np.swapaxes(sxx, -1, -2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        slope = cov / var_x
+        intercept = (sy - slope * sx) / n
+        r2 = cov * cov / (var_x * var_y)
+    return slope, intercept, r2, n.astype(int)
+
+
+def _tidy(labels, slope, intercept, r2, n, pairs):
+    i, j = np.triu_indices(len(labels), k=1) if pairs is None else np.array(pairs).T
+    return i, j, {"Slope": slope[..., i, j], "Intercept": intercept[..., i, j], "R²": r2[..., i, j], "N": n[..., i, j]}
+
+
+# One row per (dataset, x season, y season) with x before y, or only the given (x, y) season pairs
+def season_regressions(names, seasons, values, pairs=None):
+    if pairs is not None:
+        pairs = [(seasons.index(str(x)), seasons.index(str(y))) for x, y in pairs]
+    i, j, fits = _tidy(seasons, *pairwise_ols(values), pairs)
+    return pd.DataFrame({
+        "Dataset": np.repeat(names, len(i)),
+        "X Season": np.tile(np.array(seasons)[i], len(names)),
+        "Y Season": np.tile(np.array(seasons)[j], len(names)),
+        **{col: fit.ravel() for col, fit in fits.items()},
+    })
+
+
+# The same season of different datasets regressed on each other, matched by row (final position)
+def dataset_regressions(names, seasons, values):
+    i, j, fits = _tidy(names, *pairwise_ols(values.transpose(2, 1, 0)), None)
+    return pd.DataFrame({
+        "Season": np.repeat(seasons, len(i)),
+        "X Dataset": np.tile(np.array(names)[i], len(seasons)),
+        "Y Dataset": np.tile(np.array(names)[j], len(seasons)),
+        **{col: fit.ravel() for col, fit in fits.items()},
+    })
+
+
+# At most `max_points` of the (x, y) points with both values present, picked at random but
+# reproducibly, so scatter plots of large stacks stay fast
+def downsample_points(x, y, max_points=2_000, seed=0):
+    present = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[present], y[present]
+    if len(x) > max_points:
+        keep = np.sort(np.random.default_rng(seed).choice(len(x), max_points, replace=False))
+        x, y = x[keep], y[keep]
+    return x, y
+
+
+# Scatter of one season pair for every dataset with its fitted line, from one pairwise_ols result
+# instead of a regplot per dataset
+def plot_season_pair(names, seasons, values, x_season, y_season, max_points=2_000, ax=None):
+    i, j = seasons.index(str(x_season)), seasons.index(str(y_season))
+    slope, intercept, r2, _ = pairwise_ols(values[:, :, [i, j]])
+    if ax is None:
+        _, ax = plt.subplots()
+    for d, name in enumerate(names):
+        x, y = downsample_points(values[d, :, i], values[d, :, j], max_points)
+        points = ax.scatter(x, y, alpha=0.4, edgecolor="none")
+        line_x = np.array([np.nanmin(values[:, :, i]), np.nanmax(values[:, :, i])])
+        ax.plot(line_x, slope[d, 0, 1] * line_x + intercept[d, 0, 1], color=points.get_facecolor()[0],
+                alpha=1.0, label=f"{name} (R² = {r2[d, 0, 1]:.2f})")
+    ax.set_xlabel(str(x_season))
+    ax.set_ylabel(str(y_season))
+    ax.legend()
+    return ax
+
+
+# R² of every season pair as one heatmap per dataset, in place of a pairplot over every column
+def plot_r2_matrix(names, seasons, values, axes=None):
+    _, _, r2, _ = pairwise_ols(values)
+    if axes is None:
+        _, axes = plt.subplots(1, len(names), figsize=(4 * len(names), 4), squeeze=False)
+        axes = axes[0]
+    for d, (name, ax) in enumerate(zip(names, axes)):
+        image = ax.imshow(r2[d], vmin=0, vmax=1, cmap="viridis")
+        ax.set_title(name)
+        ax.set_xticks(range(len(seasons)), seasons, rotation=90)
+        ax.set_yticks(range(len(seasons)), seasons)
+    axes[-1].figure.colorbar(image, ax=list(axes), label="R²")
+    return axes
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from bootstrap import lazy_import
+from instrumentation import timed
+
+# scikit-learn and joblib are only imported when a model is first fitted or loaded
+joblib = lazy_import("joblib")
+linear_model = lazy_import("sklearn.linear_model")
+model_selection = lazy_import("sklearn.model_selection")
+preprocessing = lazy_import("sklearn.preprocessing")
+
+
+# Content hash of an uploaded file, used as the data part of every cache key
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Train-test split, scale and fit, exactly as the app has always done it
+@timed("Fit ElasticNet")
+def fit_elasticnet(df, features, target, alpha, l1_ratio, test_size=0.2, random_state=42):
+    X = df[features]
+    y = df[target]
+
+    X_train, X_test, y_train, y_test = model_selection.train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+    scaler = preprocessing.StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+
+    model = linear_model.ElasticNet(alpha=alpha, l1_ratio=l1_ratio)
+    model.fit(X_train_scaled, y_train)
+    return scaler, model
+
+
+# Predictions for every row of `df` with a fitted (scaler, model) pair
+def predict_frame(scaler, model, df, features):
+    return model.predict(scaler.transform(df[features]))
+
+
+class ModelCache:
+    # Bounded LRU of fitted (scaler, model) pairs, optionally mirrored to disk with joblib.
+    # One instance is shared by every session through st.cache_resource, hence the lock.
+
+    def __init__(self, max_entries=8, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest, features, target, alpha, l1_ratio):
+        raw = f"{digest}|{','.join(features)}|{target}|{float(alpha)!r}|{float(l1_ratio)!r}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.cache_dir and os.path.exists(self._path(key)):
+            value = joblib.load(self._path(key))
+            self._store(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._store(key, value)
+        if self.cache_dir:
+            joblib.dump(value, self._path(key))
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,182 @@
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import lazy_import
+from instrumentation import background_run
+from model_cache import predict_frame
+
+# joblib is only imported when a model is saved or loaded
+joblib = lazy_import("joblib")
+
+DEFAULT_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join(tempfile.gettempdir(), "model_registry"))
+
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ModelRegistry:
+    # Versioned fitted pipelines on local disk, one directory per version:
+    #   <directory>/<name>/v0001/pipeline.joblib  the (scaler, model) pair, dumped uncompressed
+    #   <directory>/<name>/v0001/metadata.json    features, target, hyperparameters, data digest, ...
+    # Versions are never modified once written, so loaded pipelines are cached without invalidation.
+    # Loading memory-maps the fitted arrays, so processes sharing a registry share their pages.
+    # One instance is shared by every session through st.cache_resource, hence the lock.
+
+    def __init__(self, directory, max_loaded=16):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version_dir(self, name, version):
+        return os.path.join(self.directory, name, f"v{version:04d}")
+
+    def names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if NAME_PATTERN.match(name) and os.path.isdir(os.path.join(self.directory, name)))
+
+    def versions(self, name):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(entry[1:]) for entry in os.listdir(path) if re.fullmatch(r"v\d+", entry)
+                      and os.path.exists(os.path.join(path, entry, "metadata.json")))
+
+    def metadata(self, name, version):
+        with open(os.path.join(self._version_dir(name, version), "metadata.json"), encoding="utf-8") as meta:
+            return json.load(meta)
+
+    # Writes the next version of `name` and returns its metadata. The version directory is written
+    # under a temporary name and renamed, so readers never see a half-written version; a concurrent
+    # save of the same name that loses the rename retries with the following number.
+    def save(self, name, scaler, model, features, target, **metadata):
+        if not NAME_PATTERN.match(name):
+            raise ValueError("Model names may only contain letters, digits, '-' and '_'")
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        tmp_dir = os.path.join(self.directory, name, f".tmp-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(tmp_dir, exist_ok=True)
+        joblib.dump((scaler, model), os.path.join(tmp_dir, "pipeline.joblib"))
+
+        while True:
+            version = max(self.versions(name), default=0) + 1
+            meta = {
+                "name": name,
+                "version": version,
+                "features": list(features),
+                "target": target,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                **metadata,
+            }
+            with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as out:
+                json.dump(meta, out, indent=2, default=str)
+            try:
+                os.rename(tmp_dir, self._version_dir(name, version))
+                return meta
+            except OSError:
+                if not os.path.exists(self._version_dir(name, version)):
+                    raise
+
+    # (scaler, model, metadata) of one version, the latest when `version` is None
+    def load(self, name, version=None):
+        if version is None:
+            version = max(self.versions(name), default=None)
+            if version is None:
+                raise KeyError(f"No model named {name!r}")
+        key = (name, version)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+
+        scaler, model = joblib.load(os.path.join(self._version_dir(name, version), "pipeline.joblib"), mmap_mode="r")
+        value = (scaler, model, self.metadata(name, version))
+        with self._lock:
+            self._loaded[key] = value
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return value
+
+
+class MicroBatcher:
+    # Collects prediction requests from every session and scores them together: the first request
+    # of a batch waits up to `max_wait` seconds for others, then all rows queued for the same model
+    # go through one vectorized predict_frame call. Requests carry their own rows, so a session can
+    # submit a single form input or many queued inputs at once.
+
+    def __init__(self, max_batch_rows=10_000, max_wait=0.01):
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self.last_batch = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    # Predictions for `rows` (a list of feature-value lists) with the pipeline identified by `key`.
+    # Blocks until the batch holding this request has been scored.
+    def predict(self, key, scaler, model, features, rows, timeout=30):
+        future = Future()
+        self._queue.put((key, scaler, model, list(features), np.asarray(rows, dtype=float).reshape(-1, len(features)), future))
+        self._ensure_worker()
+        return future.result(timeout)
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0][4])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                rows += len(batch[-1][4])
+            self._score(batch)
+
+    def _score(self, batch):
+        groups = OrderedDict()
+        for request in batch:
+            groups.setdefault(request[0], []).append(request)
+
+        with background_run("Predict batch") as record:
+            record["rows"] = sum(len(request[4]) for request in batch)
+            for requests in groups.values():
+                _, scaler, model, features, _, _ = requests[0]
+                try:
+                    frame = pd.DataFrame(np.vstack([request[4] for request in requests]), columns=features)
+                    predictions = predict_frame(scaler, model, frame, features)
+                except Exception as e:
+                    for request in requests:
+                        request[5].set_exception(e)
+                    continue
+                start = 0
+                for request in requests:
+                    end = start + len(request[4])
+                    request[5].set_result(predictions[start:end])
+                    start = end
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.last_batch = {"requests": len(batch), "models": len(groups), "rows": record["rows"]}
@@ -0,0 +1,101 @@
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from bootstrap import import_times
+from instrumentation import PROFILERS, background_runs, begin_rerun, end_rerun, reruns_to_json
+
+# Reruns kept per session for the panel and the JSON export
+HISTORY = 20
+
+
+# The panel is hidden unless the page is opened with ?profile=1 or PROFILE_PANEL=1 is set.
+# Stages are recorded either way; without the panel that only costs a few perf_counter calls.
+def panel_enabled():
+    return st.query_params.get("profile") == "1" or os.environ.get("PROFILE_PANEL") == "1"
+
+
+def start_rerun(app):
+    profiler = st.session_state.pop("profile_next_rerun", None)
+    begin_rerun(app, track_memory=st.session_state.get("profiling_track_memory", False), profiler=profiler)
+
+
+# Ends the rerun and renders the panel for it; call it before st.stop() to still show the panel
+def finish_rerun():
+    rerun = end_rerun()
+    if rerun is None:
+        return
+    history = st.session_state.setdefault("profiling_history", [])
+    history.append(rerun)
+    del history[:-HISTORY]
+    if panel_enabled():
+        _render_panel(rerun, history)
+
+
+# Wraps a script body: with profiled_rerun("app.py"): ...
+# The rerun is always ended, so the tracemalloc and profiler it started are stopped even when the body
+# raises, calls st.stop() or is interrupted by a widget rerun. The panel is only drawn when the body
+# ran to the end (or called finish_rerun() itself), since a stopping script cannot draw any more.
+@contextmanager
+def profiled_rerun(app):
+    start_rerun(app)
+    try:
+        yield
+    except BaseException:
+        end_rerun()
+        raise
+    finish_rerun()
+
+
+def _stages_frame(rerun):
+    return pd.DataFrame([
+        {
+            "Stage": "  " * record["depth"] + record["stage"],
+            "Wall (ms)": round(record["wall"] * 1000, 2),
+            "Peak (KiB)": record["peak_kb"],
+            "Rows": record["rows"],
+        }
+        for record in rerun.stages
+    ], columns=["Stage", "Wall (ms)", "Peak (KiB)", "Rows"]).astype({"Rows": "Int64"})
+
+
+def _render_panel(rerun, history):
+    with st.sidebar.expander("⏱️ Profiling", expanded=True):
+        st.write(f"**{rerun.app}** rerun: {rerun.wall * 1000:,.1f} ms"
+                 + (f", peak {rerun.peak_kb:,.0f} KiB traced" if rerun.peak_kb is not None else ""))
+        if rerun.memory_note:
+            st.caption(rerun.memory_note)
+        st.dataframe(_stages_frame(rerun), hide_index=True)
+
+        st.checkbox("Track peak memory (tracemalloc, slower)", key="profiling_track_memory")
+        profiler = st.selectbox("Profiler", PROFILERS, key="profiling_profiler")
+        if st.button("Profile Next Rerun"):
+            st.session_state.profile_next_rerun = profiler
+            st.rerun()
+
+        if rerun.profile:
+            st.write(f"{rerun.profiler} capture of this rerun:")
+            st.code(rerun.profile, language=None)
+
+        background = background_runs()
+        if background:
+            st.write("Downloads and background work (all sessions):")
+            st.dataframe(pd.DataFrame([
+                {"Task": run.app, "Started": run.started_at, "Wall (ms)": round(run.wall * 1000, 2),
+                 "Rows": run.stages[0]["rows"] if run.stages else None}
+                for run in background
+            ]), hide_index=True)
+
+        times = import_times()
+        if times:
+            st.write("Deferred imports (s):")
+            st.dataframe(pd.Series(times, name="Seconds").round(3).sort_values(ascending=False))
+
+        st.download_button(
+            label="Export Reruns (JSON)",
+            data=lambda: reruns_to_json(history + background),
+            file_name=f"profile_{rerun.app.replace('.', '_')}.json",
+            mime="application/json"
+        )
@@ -0,0 +1,259 @@
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+from rc_processing import CATEGORY_ORDER, REQUIRED_COLUMNS, process_rc
+
+KEY_COLUMNS = ["Project Number", "Activity ID"]
+GROUP_COLUMNS = ["Category", "RC Type"]
+DATE_COLUMNS = ["Split MD Date", "Certificate Validity End Date"]
+KEY_COLUMN = "Row Key"
+HASH_COLUMN = "Row Hash"
+
+# Snapshot names become part of a file name, so only a strict set of characters is allowed
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+# Text columns are factorized first and only their distinct values hashed, which is several times
+# faster than hashing every string; missing values all hash to the same constant
+def _column_hash(column):
+    if column.dtype.kind in "biufcmM":
+        return pd.util.hash_array(column.to_numpy())
+    codes, uniques = pd.factorize(column)
+    hashed = np.append(pd.util.hash_array(np.asarray(uniques, dtype=object)), np.uint64(0))
+    return hashed[codes]
+
+
+def _combine(hashes, more):
+    return hashes * np.uint64(1_000_003) ^ more
+
+
+# Key columns keep whatever cell types the export used (ints, text, floats when a column has blanks,
+# or a mix), which would differ between exports and between a snapshot read back from Parquet and
+# rows added later. The snapshot holds them as text: integral numbers without a decimal part,
+# missing values as missing. Only the distinct values are formatted.
+def key_text(column):
+    codes, uniques = pd.factorize(column)
+    labels = np.array([
+        str(int(value)) if isinstance(value, (float, np.floating)) and float(value).is_integer() else str(value)
+        for value in uniques
+    ] + [None], dtype=object)
+    return pd.Series(labels[codes], index=column.index, name=column.name)
+
+
+# 64-bit key of every row from Project Number, Activity ID and the occurrence of that pair within the
+# file, so an export that repeats a pair (one row per man-day split) still gives every row its own key.
+# Occurrences come from one stable sort of the pair hashes instead of a groupby.
+def row_keys(df):
+    pair = _combine(_column_hash(df[KEY_COLUMNS[0]]), _column_hash(df[KEY_COLUMNS[1]]))
+    order = np.argsort(pair, kind="stable")
+    sorted_pair = pair[order]
+    run_start = np.flatnonzero(np.r_[True, sorted_pair[1:] != sorted_pair[:-1]])
+    occurrence = np.empty(len(df), dtype=np.int64)
+    occurrence[order] = np.arange(len(df)) - np.repeat(run_start, np.diff(np.r_[run_start, len(df)]))
+    return pd.Index(_combine(pair, pd.util.hash_array(occurrence)), name=KEY_COLUMN)
+
+
+# One 64-bit hash per row over REQUIRED_COLUMNS; text dates are parsed first so a file with text or
+# datetime date cells hashes the same
+def row_hashes(df):
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for col in REQUIRED_COLUMNS:
+        column = df[col]
+        if col in DATE_COLUMNS and column.dtype.kind != "M":
+            column = pd.to_datetime(column, errors="coerce")
+        hashes = _combine(hashes, _column_hash(column))
+    return hashes
+
+
+# Snapshot rows in Category order without the key and hash, like process_rc's output. Applying an
+# export replaces RCSnapshot.rows instead of modifying it, so a caller can keep the rows of one version.
+def processed_frame(rows):
+    if rows is None:
+        return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    return rows.drop(columns=HASH_COLUMN).sort_values("Category", kind="stable").reset_index(drop=True)
+
+
+def _empty_counts(names, dtype="int64"):
+    return pd.Series(dtype=dtype, index=pd.MultiIndex.from_arrays([[]] * len(names), names=names))
+
+
+def _nonzero(series):
+    return series[series.abs() > 1e-9]
+
+
+class RCSnapshot:
+    # Processed rows of the last applied export, keyed by row_keys() and carrying their row hash, plus
+    # the Category x RC Type aggregates kept as additive counts: man-days and row counts per group, and
+    # how many rows of each group name a planner or responsible. Applying a new export only categorizes
+    # rows that are new or changed, then subtracts the old versions and adds the new ones.
+
+    def __init__(self):
+        self.rows = None
+        self.man_days = _empty_counts(GROUP_COLUMNS, "float64")
+        self.group_rows = _empty_counts(GROUP_COLUMNS)
+        self.planners = _empty_counts(GROUP_COLUMNS + ["Project Planner"])
+        self.responsibles = _empty_counts(GROUP_COLUMNS + ["Project Responsible"])
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return 0 if self.rows is None else len(self.rows)
+
+    # Rows with a negative date difference have no Category and are left out, as in build_rc_cube
+    def _add_counts(self, rows, sign):
+        rows = rows[rows["Category"].notna()]
+        if rows.empty:
+            return
+        rows = rows.assign(Category=rows["Category"].astype(str))
+        groups = rows.groupby(GROUP_COLUMNS, dropna=False)
+        self.man_days = self.man_days.add(sign * groups["Split Man-Days"].sum(), fill_value=0)
+        self.group_rows = _nonzero(self.group_rows.add(sign * groups.size(), fill_value=0))
+        self.man_days = self.man_days[self.man_days.index.isin(self.group_rows.index)]
+        for attr, col in [("planners", "Project Planner"), ("responsibles", "Project Responsible")]:
+            counts = rows.groupby(GROUP_COLUMNS + [col], dropna=False).size()
+            setattr(self, attr, _nonzero(getattr(self, attr).add(sign * counts, fill_value=0)))
+
+    @timed("Apply RC delta", rows=lambda summary: summary["added"] + summary["changed"])
+    def apply(self, raw):
+        raw = raw[REQUIRED_COLUMNS].assign(**{col: key_text(raw[col]) for col in KEY_COLUMNS})
+        keys = row_keys(raw)
+        hashes = row_hashes(raw)
+
+        with self.lock:
+            if not len(self):
+                incoming = np.ones(len(raw), dtype=bool)
+                changed = np.zeros(len(raw), dtype=bool)
+                outgoing = np.zeros(0, dtype=bool)
+            else:
+                position = self.rows.index.get_indexer(keys)
+                known = position >= 0
+                changed = known & (self.rows[HASH_COLUMN].to_numpy()[np.where(known, position, 0)] != hashes)
+                incoming = ~known | changed
+                # Snapshot rows missing from the new export, plus the old versions of changed rows
+                outgoing = np.ones(len(self), dtype=bool)
+                outgoing[position[known & ~changed]] = False
+
+            summary = {
+                "added": int(incoming.sum() - changed.sum()),
+                "changed": int(changed.sum()),
+                "removed": int(outgoing.sum() - changed.sum()),
+                "unchanged": int(len(raw) - incoming.sum()),
+            }
+
+            if not incoming.any() and not outgoing.any():
+                return summary
+
+            # Only the new and changed rows go through categorization
+            delta = process_rc(raw[incoming].set_axis(keys[incoming]))
+            delta[HASH_COLUMN] = pd.Series(hashes[incoming], index=keys[incoming])
+
+            if not len(self):
+                self.rows = delta
+            else:
+                self._add_counts(self.rows[outgoing], -1)
+                self.rows = pd.concat([self.rows[~outgoing], delta])
+            self._add_counts(delta, 1)
+        return summary
+
+    def processed(self):
+        return processed_frame(self.rows)
+
+    # (rcc, projects_by_category) in build_rc_cube's layout, from the counts alone.
+    # Planner and responsible lists are sorted by name rather than by first appearance.
+    def cube(self):
+        # Rounding drops the float drift that repeated adds and subtracts leave behind
+        rcc = self.man_days.round(6).rename("Man-Days").rename_axis(GROUP_COLUMNS).reset_index()
+        for attr, col in [("planners", "Project Planner"), ("responsibles", "Project Responsible")]:
+            names = getattr(self, attr).rename_axis(GROUP_COLUMNS + [col]).reset_index()[GROUP_COLUMNS + [col]]
+            names = names.sort_values(col, na_position="last").groupby(GROUP_COLUMNS, dropna=False)[col].agg(list)
+            rcc = rcc.merge(names.reset_index(), on=GROUP_COLUMNS, how="left")
+        rcc["Category"] = pd.Categorical(rcc["Category"], categories=CATEGORY_ORDER, ordered=True)
+        rcc = rcc.sort_values(GROUP_COLUMNS, ignore_index=True)
+
+        planners = self.planners.rename_axis(GROUP_COLUMNS + ["Project Planner"]).reset_index()
+        planners = planners.sort_values("Project Planner", na_position="last")
+        planners["Category"] = pd.Categorical(planners["Category"], categories=CATEGORY_ORDER, ordered=True)
+        projects_by_category = planners.groupby("Category", observed=True)["Project Planner"].unique()
+        return rcc, projects_by_category
+
+    # Rows and counts are replaced by apply() rather than modified, so a copy can share them
+    def copy(self):
+        snapshot = RCSnapshot()
+        with self.lock:
+            snapshot.rows = self.rows
+            snapshot.man_days = self.man_days
+            snapshot.group_rows = self.group_rows
+            snapshot.planners = self.planners
+            snapshot.responsibles = self.responsibles
+        return snapshot
+
+    # Key columns are text (see key_text), so every column has one type Parquet can store
+    def save(self, path):
+        with self.lock:
+            if self.rows is None:
+                return
+            table = self.rows.reset_index()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                table.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    # Counts are rebuilt from the stored rows with one groupby, once per load
+    @classmethod
+    def load(cls, path):
+        snapshot = cls()
+        table = pd.read_parquet(path)
+        table["Category"] = pd.Categorical(table["Category"].astype(object), categories=CATEGORY_ORDER, ordered=True)
+        snapshot.rows = table.set_index(KEY_COLUMN)
+        snapshot._add_counts(snapshot.rows, 1)
+        return snapshot
+
+
+class SnapshotStore:
+    # Named snapshots shared by every session, persisted as rc_snapshot_<name>.parquet in `directory`
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _path(self, name):
+        if not NAME_PATTERN.match(name):
+            raise ValueError("Snapshot names may only contain letters, digits, '-' and '_'")
+        return os.path.join(self.directory, f"rc_snapshot_{name}.parquet")
+
+    def get(self, name):
+        path = self._path(name)
+        with self._lock:
+            if name not in self._snapshots:
+                self._snapshots[name] = RCSnapshot.load(path) if os.path.exists(path) else RCSnapshot()
+            return self._snapshots[name]
+
+    # Applies `raw` to a copy of the named snapshot and writes the copy; the shared snapshot is only
+    # replaced once the file is on disk, so a failed write leaves memory and disk as they were.
+    # Returns (summary, snapshot).
+    def apply(self, name, raw):
+        path = self._path(name)
+        with self._write_lock:
+            snapshot = self.get(name).copy()
+            summary = snapshot.apply(raw)
+            os.makedirs(self.directory, exist_ok=True)
+            snapshot.save(path)
+            with self._lock:
+                self._snapshots[name] = snapshot
+        return summary, snapshot
+
+    def reset(self, name):
+        path = self._path(name)
+        with self._lock:
+            self._snapshots[name] = RCSnapshot()
+            if os.path.exists(path):
+                os.remove(path)
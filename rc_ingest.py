@@ -0,0 +1,109 @@
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+import pandas as pd
+
+from instrumentation import timed
+from rc_processing import REQUIRED_COLUMNS
+
+# Explicit dtypes for the text and numeric columns; the two date columns are converted in process_rc
+# and "Project Number" / "Activity ID" keep whatever type the export uses
+RC_DTYPES = {
+    "Customer Name": str,
+    "Standard Name": str,
+    "Project Responsible": str,
+    "Project Planner": str,
+    "Project Status": str,
+    "Split Man-Days": "float64",
+}
+
+# Parsed uploads are kept as Parquet here, keyed by file hash (RC_CACHE_DIR overrides it)
+DEFAULT_CACHE_DIR = os.environ.get("RC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "rc_cache"))
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"Missing columns: {', '.join(missing)}")
+
+
+# calamine (python-calamine) parses .xlsx far faster than openpyxl; fall back when it is not installed
+def excel_engine():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    return "calamine"
+
+
+def read_header(data, sheet_name='Sheet1', engine=None):
+    return list(pd.read_excel(BytesIO(data), sheet_name=sheet_name, nrows=0, engine=engine or excel_engine()).columns)
+
+
+# Parsed files kept on disk; the least recently used are deleted beyond this (RC_CACHE_MAX_FILES)
+MAX_CACHE_FILES = int(os.environ.get("RC_CACHE_MAX_FILES", "32"))
+
+# Only these files are pruned; incremental-mode snapshots may share the directory
+CACHE_FILE_PATTERN = re.compile(r"^[0-9a-f]{64}-.+\.parquet$")
+
+
+def _cache_path(cache_dir, digest, sheet_name):
+    return os.path.join(cache_dir, f"{digest}-{sheet_name}.parquet")
+
+
+# Keeps the `max_files` most recently used cache files (reads touch their mtime)
+def prune_cache(cache_dir, max_files=MAX_CACHE_FILES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if CACHE_FILE_PATTERN.match(name):
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    for _, path in sorted(entries, reverse=True)[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Validate the header first, then parse only REQUIRED_COLUMNS; results are cached as Parquet by file hash
+@timed("Parse RC export", rows=len)
+def read_rc_export(data, sheet_name='Sheet1', cache_dir=DEFAULT_CACHE_DIR):
+    digest = hashlib.sha256(data).hexdigest()
+    path = _cache_path(cache_dir, digest, sheet_name) if cache_dir else None
+
+    if path and os.path.exists(path):
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+            return df
+        except Exception:
+            os.remove(path)
+
+    engine = excel_engine()
+    header = read_header(data, sheet_name=sheet_name, engine=engine)
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
+
+    df = pd.read_excel(BytesIO(data), sheet_name=sheet_name, usecols=REQUIRED_COLUMNS, dtype=RC_DTYPES, engine=engine)
+    df = df[REQUIRED_COLUMNS]
+
+    if path:
+        # Columns with mixed cell types cannot be written to Parquet; such files just skip the disk cache
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            prune_cache(cache_dir)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return df
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# Define required columns
+REQUIRED_COLUMNS = ["Customer Name","Project Number","Standard Name","Project Responsible", "Project Planner","Activity ID", "Project Status", "Split MD Date", "Split Man-Days", "Certificate Validity End Date"]
+
+# Sort Category column based on defined order
+CATEGORY_ORDER = ["0-30 days", "31-60 days", "61-90 days", "91-180 days","More than 180 days", "N/A"]
+
+# Bin edges for CATEGORY_ORDER (without "N/A"): 0-30, 31-60, 61-90, 91-180 and more than 180 days
+CATEGORY_BINS = [-0.5, 30.5, 60.5, 90.5, 180.5, np.inf]
+
+# Project statuses that mean the RC has not been received yet
+RC_NOT_RECEIVED_STATUSES = ["Quote Revision", "Final PA Review"]
+
+
+# Vectorized categorization of the date difference (in days).
+# Missing differences become "N/A"; negative ones fall outside CATEGORY_ORDER and stay missing,
+# exactly like the old "NA" label did once the column was made categorical.
+def categorize_days(diff):
+    category = pd.cut(diff, bins=CATEGORY_BINS, labels=CATEGORY_ORDER[:-1])
+    category = category.cat.add_categories(["N/A"]).cat.as_ordered()
+    category = category.mask(diff.isna(), "N/A")
+    return category
+
+
+def assign_rc_type(status):
+    return pd.Series(
+        np.where(status.isin(RC_NOT_RECEIVED_STATUSES), "RC Not Received", "RC Received"),
+        index=status.index
+    )
+
+
+# Date difference, Category and RC Type for a frame holding REQUIRED_COLUMNS, sorted by Category
+@timed("Categorize RC", rows=len)
+def process_rc(df):
+    df = df[REQUIRED_COLUMNS].copy()
+
+    df["Split MD Date"] = df["Split MD Date"].astype('datetime64[ns]')
+    df["Certificate Validity End Date"] = df["Certificate Validity End Date"].astype('datetime64[ns]')
+
+    df["Date Difference"] = (df["Certificate Validity End Date"] - df["Split MD Date"]).dt.days
+
+    df["Category"] = categorize_days(df["Date Difference"])
+    df["RC Type"] = assign_rc_type(df["Project Status"])
+
+    return df.sort_values("Category")
+
+
+# Category x RC Type aggregate built once per upload: summed man-days plus the unique planners and
+# responsibles of each group, and the unique planners of each Category for the "Projects in ..." list
+@timed("Aggregate RC cube", rows=lambda cube: len(cube[0]))
+def build_rc_cube(df):
+    groups = df.groupby(['Category', 'RC Type'], observed=True)
+    rcc = groups['Split Man-Days'].sum().to_frame('Man-Days')
+    rcc['Project Planner'] = groups['Project Planner'].unique().map(list)
+    rcc['Project Responsible'] = groups['Project Responsible'].unique().map(list)
+    rcc = rcc.reset_index()
+
+    projects_by_category = df.groupby('Category', observed=True)['Project Planner'].unique()
+    return rcc, projects_by_category
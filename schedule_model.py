@@ -0,0 +1,171 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Compact schedule frame: one row per scheduled activity, under the same column names as the grid
+# and the export, but typed. Text columns are categoricals (Auditor 1 and Auditor 2 share one set of
+# categories, unassigned is missing), the date is datetime64 and times are nullable integer minutes
+# from midnight. Strings are only produced by to_display() for the grid and the export.
+CATEGORY_COLUMNS = ["Site", "Activity", "Core Status", "Auditor 1", "Auditor 2", "Allowed Auditors"]
+AUDITOR_COLUMNS = ["Auditor 1", "Auditor 2"]
+MINUTE_COLUMNS = ["Start Time", "End Time", "Duration (mins)"]
+COLUMNS = ["Site", "Activity", "Core Status", "Proposed Date", "Start Time", "End Time",
+           "Auditor 1", "Auditor 2", "Allowed Auditors", "Duration (mins)"]
+
+# Vocabulary each text column is interned in while scheduling; both auditor columns share one
+_VOCABULARY = {"Site": "site", "Activity": "activity", "Core Status": "core", "Proposed Date": "day",
+               "Auditor 1": "auditor", "Auditor 2": "auditor", "Allowed Auditors": "allowed"}
+
+
+class ScheduleBuilder:
+    # Collects scheduled activities column by column while the engine runs. Text values are interned
+    # as integer codes on the way in, so a row costs ten small ints instead of a dict of strings.
+    __slots__ = ("_codes", "_labels", "_columns")
+
+    def __init__(self):
+        self._codes = {vocabulary: {} for vocabulary in set(_VOCABULARY.values())}
+        self._labels = {vocabulary: [] for vocabulary in set(_VOCABULARY.values())}
+        self._columns = {col: [] for col in COLUMNS}
+
+    def _code(self, vocabulary, value):
+        if value is None or value == "":
+            return -1
+        codes = self._codes[vocabulary]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._labels[vocabulary].append(value)
+        return code
+
+    # `day` is an ISO date string; `start` and `end` are minutes from midnight
+    def append(self, site, activity, core_status, day, start, end, auditor_1, auditor_2, allowed, duration):
+        values = {"Site": site, "Activity": activity, "Core Status": core_status, "Proposed Date": day,
+                  "Auditor 1": auditor_1, "Auditor 2": auditor_2, "Allowed Auditors": allowed}
+        for col, value in values.items():
+            self._columns[col].append(self._code(_VOCABULARY[col], value))
+        self._columns["Start Time"].append(start)
+        self._columns["End Time"].append(end)
+        self._columns["Duration (mins)"].append(duration)
+
+    def __len__(self):
+        return len(self._columns["Site"])
+
+    def frame(self):
+        columns = {}
+        for col in COLUMNS:
+            values = np.asarray(self._columns[col], dtype=np.int32)
+            if col in MINUTE_COLUMNS:
+                columns[col] = pd.array(values, dtype="Int16")
+            elif col == "Proposed Date":
+                days = pd.to_datetime(pd.Index(self._labels["day"], dtype=object), format="%Y-%m-%d")
+                columns[col] = days[values] if len(values) else pd.DatetimeIndex([], dtype=days.dtype)
+            else:
+                columns[col] = pd.Categorical.from_codes(values, categories=self._labels[_VOCABULARY[col]])
+        return pd.DataFrame(columns, columns=COLUMNS)
+
+
+def empty_schedule():
+    return ScheduleBuilder().frame()
+
+
+@lru_cache(maxsize=4)
+def _time_labels(size):
+    return np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(size)], dtype=object)
+
+
+# "HH:MM" for every minute value, missing values as ""; one table lookup instead of a format per row
+def minutes_to_text(minutes):
+    minutes = pd.Series(minutes).astype("Int64")
+    missing = minutes.isna().to_numpy()
+    values = minutes.fillna(0).to_numpy(dtype=np.int64).clip(0)
+    labels = _time_labels(1440 * (int(values.max(initial=0)) // 1440 + 1))[values]
+    labels[missing] = ""
+    return labels
+
+
+# Minutes from midnight for "HH:MM" (or "HH:MM:SS") text, missing where it does not parse
+def text_to_minutes(text):
+    parts = pd.Series(text, dtype=object).astype(str).str.extract(r"^\s*(\d{1,2}):(\d{2})")
+    return (pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])).astype("Int16")
+
+
+def _categories_text(column):
+    return column.astype(object).where(column.notna(), "")
+
+
+# String frame for the grid and the export, in the layout the scheduler has always produced
+def to_display(schedule_df):
+    display = pd.DataFrame(index=schedule_df.index)
+    for col in schedule_df.columns:
+        column = schedule_df[col]
+        if col == "Proposed Date":
+            display[col] = column.dt.strftime("%Y-%m-%d").astype(object).where(column.notna(), "")
+        elif col in ("Start Time", "End Time"):
+            display[col] = minutes_to_text(column)
+        elif col == "Duration (mins)":
+            display[col] = column.astype("Int64")
+        elif col in CATEGORY_COLUMNS:
+            display[col] = _categories_text(column)
+        else:
+            display[col] = column
+    return display
+
+
+# Compact frame from the grid's string frame. Categories of `previous` are kept (new values are
+# added after them), so the result compares against `previous` column by column.
+def from_display(display_df, previous=None):
+    schedule_df = pd.DataFrame(index=display_df.index)
+    for col in display_df.columns:
+        column = display_df[col]
+        if col == "Proposed Date":
+            schedule_df[col] = pd.to_datetime(column.astype(str), format="%Y-%m-%d", errors="coerce")
+        elif col in ("Start Time", "End Time"):
+            schedule_df[col] = text_to_minutes(column).to_numpy()
+        elif col == "Duration (mins)":
+            schedule_df[col] = pd.to_numeric(column, errors="coerce").astype("Int16")
+        elif col in CATEGORY_COLUMNS:
+            values = column.astype(object).where(column.notna() & (column.astype(str) != ""), None)
+            known = list(previous[col].cat.categories) if previous is not None and col in previous else []
+            known_set = set(known)
+            categories = known + [value for value in pd.unique(values.dropna().to_numpy()) if value not in known_set]
+            schedule_df[col] = pd.Categorical(values, categories=categories)
+        else:
+            schedule_df[col] = column
+    _share_auditor_categories(schedule_df)
+    return schedule_df
+
+
+def _share_auditor_categories(schedule_df):
+    if all(col in schedule_df for col in AUDITOR_COLUMNS):
+        categories = schedule_df[AUDITOR_COLUMNS[0]].cat.categories.union(schedule_df[AUDITOR_COLUMNS[1]].cat.categories, sort=False)
+        for col in AUDITOR_COLUMNS:
+            schedule_df[col] = schedule_df[col].cat.set_categories(categories)
+
+
+# Copy of `schedule_df` with the rows of `rows` (a compact frame indexed like it) replaced; categories
+# gained by the edit are added to the columns
+def replace_rows(schedule_df, rows):
+    updated = schedule_df.copy()
+    for col in rows.columns:
+        values = rows[col]
+        if isinstance(updated[col].dtype, pd.CategoricalDtype) and isinstance(values.dtype, pd.CategoricalDtype):
+            categories = updated[col].cat.categories.union(values.cat.categories, sort=False)
+            updated[col] = updated[col].cat.set_categories(categories)
+            values = values.cat.set_categories(categories)
+        updated.loc[rows.index, col] = values
+    _share_auditor_categories(updated)
+    return updated
+
+
+# Rows where any of `columns` differs between two frames with the same index; missing equals missing
+def changed_rows(before, after, columns):
+    changed = np.zeros(len(before), dtype=bool)
+    for col in columns:
+        a, b = before[col], after[col]
+        if isinstance(a.dtype, pd.CategoricalDtype) and isinstance(b.dtype, pd.CategoricalDtype):
+            categories = a.cat.categories.union(b.cat.categories, sort=False)
+            a, b = a.cat.set_categories(categories).cat.codes, b.cat.set_categories(categories).cat.codes
+        same = a.eq(b).fillna(False).to_numpy(dtype=bool) | (a.isna() & b.isna()).to_numpy()
+        changed |= ~same
+    return changed
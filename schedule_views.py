@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+CORE_COLOR = "#6c5ce7"
+NON_CORE_COLOR = "#00b894"
+CONFLICT_COLOR = "#d63031"
+
+
+def _auditor_column(schedule_df, column):
+    values = schedule_df[column]
+    return values.astype(object).where(values.notna(), "").astype(str)
+
+
+# Mandays per auditor: Auditor 1 and Auditor 2 melted into one column, then one groupby-sum.
+# Every auditor in `auditors` is listed (0 when unassigned), followed by any other assigned auditor.
+@timed("Manday summary", rows=len)
+def manday_summary(schedule_df, auditors=()):
+    assigned = pd.DataFrame({
+        "Duration (mins)": pd.to_numeric(schedule_df["Duration (mins)"]),
+        "Auditor 1": _auditor_column(schedule_df, "Auditor 1"),
+        "Auditor 2": _auditor_column(schedule_df, "Auditor 2"),
+    }).melt(id_vars="Duration (mins)", value_name="Auditor")
+    assigned = assigned[assigned["Auditor"] != ""]
+
+    mandays = ((assigned["Duration (mins)"] / 60) / 8).round(2)
+    used = mandays.groupby(assigned["Auditor"], sort=False).sum()
+
+    auditors = list(auditors)
+    known = set(auditors)
+    order = auditors + [auditor for auditor in used.index if auditor not in known]
+    used = used.reindex(order, fill_value=0.0)
+    return pd.DataFrame({"Auditor": used.index, "Mandays Used": used.to_numpy(dtype=float)})
+
+
+# Calendar events for every schedule row of the compact schedule frame (see schedule_model), built
+# column-wise; rows without a date or times are left off the calendar
+@timed("Calendar events", rows=len)
+def build_calendar_events(schedule_df, conflict_rows=frozenset()):
+    schedule_df = schedule_df[
+        schedule_df["Proposed Date"].notna() & schedule_df["Start Time"].notna() & schedule_df["End Time"].notna()
+    ]
+    if schedule_df.empty:
+        return []
+
+    day = schedule_df["Proposed Date"].to_numpy(dtype="datetime64[s]")
+    start = day + schedule_df["Start Time"].to_numpy(dtype="int64").astype("timedelta64[m]")
+    end = day + schedule_df["End Time"].to_numpy(dtype="int64").astype("timedelta64[m]")
+
+    auditor_2 = _auditor_column(schedule_df, "Auditor 2")
+    title = (
+        schedule_df["Activity"].astype(str) + " (" + _auditor_column(schedule_df, "Auditor 1")
+        + np.where(auditor_2 != "", " + " + auditor_2, "") + ")"
+    )
+    color = np.select(
+        [schedule_df.index.isin(list(conflict_rows)), schedule_df["Core Status"].to_numpy() == "Core"],
+        [CONFLICT_COLOR, CORE_COLOR],
+        NON_CORE_COLOR
+    )
+
+    columns = {
+        "id": schedule_df.index.astype(str).tolist(),
+        "title": title.tolist(),
+        "start": np.datetime_as_string(start, unit="s").tolist(),
+        "end": np.datetime_as_string(end, unit="s").tolist(),
+        "color": color.tolist(),
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
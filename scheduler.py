@@ -0,0 +1,195 @@
+import heapq
+from datetime import date, timedelta
+
+from instrumentation import timed
+from interval_index import IntervalIndex
+from schedule_model import ScheduleBuilder
+
+# Working day and lunch window, in minutes from midnight
+DAY_START = 9 * 60
+DAY_END = 18 * 60
+LUNCH_START = 13 * 60
+LUNCH_END = 13 * 60 + 30
+
+
+def parse_minutes(value):
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def next_date(iso_date):
+    return (date.fromisoformat(iso_date) + timedelta(days=1)).isoformat()
+
+
+class _AuditorQueue:
+    # Min-heap of auditors by used mandays with lazy deletion: when an auditor's usage changes a
+    # fresh entry is pushed and the stale one is dropped the next time it reaches the top.
+
+    def __init__(self, auditors, used):
+        self.used = used
+        self.members = set(auditors)
+        self._heap = [(used[a], i, a) for i, a in enumerate(auditors)]
+        heapq.heapify(self._heap)
+        self._counter = len(self._heap)
+
+    def push(self, auditor):
+        if auditor in self.members:
+            heapq.heappush(self._heap, (self.used[auditor], self._counter, auditor))
+            self._counter += 1
+
+    def pop(self):
+        while self._heap:
+            used, _, auditor = heapq.heappop(self._heap)
+            if used == self.used[auditor]:
+                return auditor
+        return None
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class ScheduleEngine:
+    # Places audit activities on site days and assigns up to two auditors to each one.
+    #  - Core activities only go to coded auditors of the site, others to any site auditor
+    #  - an auditor never exceeds the site's manday availability
+    #  - an auditor is never booked twice at the same time, across all sites and audits
+    #  - a site's activities run one after another on each day, including those rolled over from
+    #    an earlier day, and roll over to the next day when they do not fit before DAY_END
+    #  - activities that fit in the longer of the two blocks around lunch (4h30 by default) do not
+    #    run through the lunch window; longer ones cannot avoid it and start a day of their own
+    #  - an activity with no eligible auditor (no coded auditor for a Core activity, or everyone at
+    #    their manday limit) is still placed in the site's next free slot, with no auditor assigned
+    # Busy times live in an IntervalIndex keyed by (auditor, date) and auditors are picked
+    # least-used first from a priority queue, so the work per activity is a few heap pops and bisects.
+
+    def __init__(self, day_start=DAY_START, day_end=DAY_END, lunch_start=LUNCH_START, lunch_end=LUNCH_END):
+        self.day_start = day_start
+        self.day_end = day_end
+        self.lunch_start = lunch_start
+        self.lunch_end = lunch_end
+        self.busy = IntervalIndex()
+        self.used = {}
+
+    # Earliest start >= `start` on the same day that avoids lunch and ends by day_end, or None
+    def _fit_in_day(self, start, duration):
+        start = max(start, self.day_start)
+        longest_block = max(self.lunch_start - self.day_start, self.day_end - self.lunch_end)
+        if duration <= longest_block and start < self.lunch_end and start + duration > self.lunch_start:
+            start = self.lunch_end
+        if start + duration > self.day_end:
+            # Activities longer than the whole day still get a slot at the start of a fresh day
+            return start if start == self.day_start else None
+        return start
+
+    # Up to `wanted` least-used eligible auditors free in [start, end), or the minute to retry from
+    def _pick(self, queue, wanted, day, start, end, need, availability):
+        free, skipped, retry_at, eligible = [], [], None, 0
+        seen = set()
+
+        while len(free) < wanted:
+            auditor = queue.pop()
+            if auditor is None:
+                break
+            if auditor in seen:
+                continue
+            seen.add(auditor)
+            skipped.append(auditor)
+            if self.used[auditor] + need > availability.get(auditor, 0) + 1e-9:
+                continue
+            eligible += 1
+            clashes = self.busy.overlapping((auditor, day), start, end)
+            if clashes:
+                clash_end = max(iv[1] for iv in clashes)
+                retry_at = clash_end if retry_at is None else min(retry_at, clash_end)
+            else:
+                free.append(auditor)
+
+        for auditor in skipped:
+            queue.push(auditor)
+
+        if len(free) < min(wanted, eligible) and retry_at is not None:
+            return None, retry_at
+        return free, None
+
+    # `cursors` holds the end of the site's last activity per day, so rolling over to a day that
+    # already has activities starts after them
+    def _place(self, queues, allowed_key, wanted, day, cursors, duration, availability):
+        need = round((duration / 60) / 8, 2)
+        queue = queues[allowed_key]
+        cursor = cursors.get(day, self.day_start)
+
+        while True:
+            start = self._fit_in_day(cursor, duration)
+            if start is None:
+                day = next_date(day)
+                cursor = cursors.get(day, self.day_start)
+                continue
+
+            assigned, retry_at = self._pick(queue, wanted, day, start, start + duration, need, availability)
+            if assigned is None:
+                cursor = retry_at
+                continue
+
+            for auditor in assigned:
+                self.used[auditor] += need
+                self.busy.add((auditor, day), start, start + duration)
+                for q in queues.values():
+                    q.push(auditor)
+            return day, start, assigned
+
+    # Appends the site's scheduled activities to `builder` (a new one when None) and returns it
+    def schedule_site(self, site, audits, auditor_info, audit_types=None, builder=None):
+        auditors = auditor_info["auditors"]
+        coded_auditors = auditor_info["coded_auditors"]
+        availability = auditor_info["availability"]
+        for auditor in auditors:
+            self.used.setdefault(auditor, 0.0)
+
+        queues = {
+            "Core": _AuditorQueue(coded_auditors, self.used),
+            "Non-Core": _AuditorQueue(auditors, self.used),
+        }
+        allowed_text = {"Core": ", ".join(coded_auditors), "Non-Core": ", ".join(auditors)}
+        cursors = {}
+        builder = builder if builder is not None else ScheduleBuilder()
+
+        for audit in audits:
+            if audit_types is not None and audit["Audit Type"] not in audit_types:
+                continue
+
+            day = audit["Proposed Date"]
+            activities = [act for act, val in audit["Activities"].items() if val == "✔️"]
+            for activity in activities:
+                duration = audit["Durations"].get(activity, 90)
+                core_status = audit["Core Status"].get(activity, "Non-Core")
+                allowed_key = "Core" if core_status == "Core" else "Non-Core"
+                allowed = coded_auditors if allowed_key == "Core" else auditors
+                wanted = 2 if len(allowed) >= 2 else 1
+
+                day, start, assigned = self._place(queues, allowed_key, wanted, day, cursors, duration, availability)
+                cursors[day] = start + duration
+
+                builder.append(
+                    site, activity, core_status, day, start, start + duration,
+                    assigned[0] if len(assigned) > 0 else "",
+                    assigned[1] if len(assigned) > 1 else "",
+                    allowed_text[allowed_key], duration
+                )
+
+        return builder
+
+
+# Schedule every audit of the given sites (optionally only some audit types) in one engine run,
+# so auditor bookings and manday usage are shared across sites and dates. Returns the compact
+# schedule frame (see schedule_model); `progress(fraction, message)` is called after each site when given.
+@timed("Generate schedule", rows=len)
+def generate_schedule(audit_data, site_auditor_info, sites=None, audit_types=None, engine=None, progress=None):
+    engine = engine or ScheduleEngine()
+    builder = ScheduleBuilder()
+    sites = sites if sites is not None else list(audit_data)
+    for i, site in enumerate(sites):
+        if site in audit_data and site in site_auditor_info:
+            engine.schedule_site(site, audit_data[site], site_auditor_info[site], audit_types, builder)
+        if progress is not None:
+            progress((i + 1) / len(sites), f"Scheduled {site} ({i + 1}/{len(sites)} sites)")
+    return builder.frame()
@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# Activities imported without a duration (the input workbook has none) get the scheduler's default
+DEFAULT_DURATION = 90
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audits (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    audit_type TEXT NOT NULL,
+    proposed_date TEXT NOT NULL,
+    mandays REAL,
+    audit_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audits_site_type_date ON audits (site, audit_type, proposed_date);
+CREATE INDEX IF NOT EXISTS idx_audits_type ON audits (audit_type);
+CREATE INDEX IF NOT EXISTS idx_audits_date ON audits (proposed_date);
+
+CREATE TABLE IF NOT EXISTS audit_activities (
+    audit_id INTEGER NOT NULL REFERENCES audits (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    selected INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    core_status TEXT NOT NULL,
+    PRIMARY KEY (audit_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS auditors (
+    site TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    auditor TEXT NOT NULL,
+    coded INTEGER NOT NULL,
+    availability REAL NOT NULL,
+    PRIMARY KEY (site, auditor)
+);
+CREATE INDEX IF NOT EXISTS idx_auditors_auditor ON auditors (auditor);
+"""
+
+
+# Columns the input workbook needs on every sheet
+WORKBOOK_COLUMNS = ["Audit Type", "Proposed Date"]
+
+
+# Identity of an audit for deduplication: site, type, date and its activity rows. Adding or importing
+# the same audit again (a double click, a workbook imported twice) leaves the store unchanged.
+def audit_key(site, audit_type, proposed_date, rows):
+    raw = json.dumps([site, audit_type, proposed_date, [list(row) for row in rows]], default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Audits are exchanged in the app's dict format:
+# {"Audit Type", "Activities": {act: "✔️"}, "Durations": {act: mins}, "Core Status": {act: status}, "Proposed Date"}
+def _activity_rows(audit):
+    for position, (activity, mark) in enumerate(audit["Activities"].items()):
+        yield (
+            position,
+            activity,
+            int(mark == "✔️"),
+            int(audit.get("Durations", {}).get(activity, DEFAULT_DURATION)),
+            audit.get("Core Status", {}).get(activity, "Non-Core"),
+        )
+
+
+def _new_audit(audit_type, proposed_date):
+    return {"Audit Type": audit_type, "Activities": {}, "Durations": {}, "Core Status": {}, "Proposed Date": proposed_date}
+
+
+# One sheet per site (sheet name = site[:31]) as written by test2.py: Audit Type, Proposed Date, Mandays,
+# then "<activity>" (✔️/✖️) and "<activity> (Core Status)" for every activity of the site.
+# Returns (site, audit_type, proposed_date, mandays, activity_rows) tuples, one per audit.
+@timed("Read input workbook", rows=len)
+def read_input_workbook(source):
+    audits = []
+    for site, sheet in pd.read_excel(source, sheet_name=None).items():
+        if sheet.empty:
+            continue
+        missing_columns = [col for col in WORKBOOK_COLUMNS if col not in sheet.columns]
+        if missing_columns:
+            raise ValueError(f"Sheet '{site}' is missing columns: {', '.join(missing_columns)}")
+        parsed = pd.to_datetime(sheet["Proposed Date"], errors="coerce", format="mixed")
+        if parsed.isna().any():
+            rows = ", ".join(str(i + 2) for i in np.flatnonzero(parsed.isna().to_numpy())[:5])
+            raise ValueError(f"Sheet '{site}' has rows without a valid Proposed Date (rows {rows})")
+        activities = [col for col in sheet.columns if f"{col} (Core Status)" in sheet.columns]
+        dates = parsed.dt.strftime("%Y-%m-%d")
+        audit_types = sheet["Audit Type"].fillna("").astype(str)
+        if "Mandays" in sheet.columns:
+            mandays = pd.to_numeric(sheet["Mandays"], errors="coerce")
+        else:
+            mandays = pd.Series(np.nan, index=sheet.index)
+
+        selected = (sheet[activities] == "✔️").to_numpy()
+        core_status = sheet[[f"{act} (Core Status)" for act in activities]].fillna("Non-Core").to_numpy()
+
+        for i in range(len(sheet)):
+            rows = [
+                (position, act, int(selected[i, position]), DEFAULT_DURATION, str(core_status[i, position]))
+                for position, act in enumerate(activities)
+            ]
+            audits.append((str(site), audit_types.iat[i], dates.iat[i], mandays.iat[i], rows))
+    return audits
+
+
+class AuditStore(ABC):
+    # Storage for audit inputs and auditor info. Queries only return the sites, audit types
+    # and dates asked for, so schedule generation never scans the whole data set.
+
+    # Returns False when the same audit is already stored
+    def add_audit(self, site, audit, mandays=None):
+        rows = list(_activity_rows(audit))
+        return self._bulk_insert([(site, audit["Audit Type"], audit["Proposed Date"], mandays, rows)]) == 1
+
+    @abstractmethod
+    def save_auditor_info(self, site, info):
+        pass
+
+    @abstractmethod
+    def sites(self):
+        pass
+
+    @abstractmethod
+    def audits(self, sites=None, audit_types=None, date_from=None, date_to=None):
+        pass
+
+    @abstractmethod
+    def auditor_info(self, sites=None):
+        pass
+
+    # Inserts the audits that are not stored yet (see audit_key); returns how many were added
+    @abstractmethod
+    def _bulk_insert(self, audits):
+        pass
+
+    # Bulk import of an input workbook generated by test2.py; returns (audits added, audits in the
+    # workbook). Raises ValueError for a workbook that is not in the input generator's layout.
+    def import_input_workbook(self, source):
+        audits = read_input_workbook(source)
+        return self._bulk_insert(audits), len(audits)
+
+
+class InMemoryAuditStore(AuditStore):
+    # Dict-backed store: audits per site plus, per site, the positions of each audit type.
+    # Lost when the process restarts.
+
+    def __init__(self):
+        self._audits = defaultdict(list)
+        self._by_type = defaultdict(lambda: defaultdict(list))
+        self._auditors = {}
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def _bulk_insert(self, audits):
+        added = 0
+        with self._lock:
+            for site, audit_type, proposed_date, _, rows in audits:
+                key = audit_key(site, audit_type, proposed_date, rows)
+                if key in self._keys:
+                    continue
+                self._keys.add(key)
+                added += 1
+                audit = _new_audit(audit_type, proposed_date)
+                for _, activity, selected, duration, core_status in rows:
+                    audit["Activities"][activity] = "✔️" if selected else "✖️"
+                    audit["Durations"][activity] = duration
+                    audit["Core Status"][activity] = core_status
+                self._by_type[site][audit_type].append(len(self._audits[site]))
+                self._audits[site].append(audit)
+        return added
+
+    def save_auditor_info(self, site, info):
+        with self._lock:
+            self._auditors[site] = {
+                "auditors": list(info["auditors"]),
+                "coded_auditors": list(info["coded_auditors"]),
+                "availability": dict(info["availability"]),
+            }
+
+    def sites(self):
+        return list(self._audits)
+
+    def audits(self, sites=None, audit_types=None, date_from=None, date_to=None):
+        result = {}
+        for site in (sites if sites is not None else list(self._audits)):
+            site_audits = self._audits.get(site, [])
+            if audit_types is None:
+                positions = range(len(site_audits))
+            else:
+                by_type = self._by_type.get(site, {})
+                positions = sorted(i for audit_type in set(audit_types) for i in by_type.get(audit_type, []))
+            matches = [
+                site_audits[i] for i in positions
+                if (date_from is None or site_audits[i]["Proposed Date"] >= date_from)
+                and (date_to is None or site_audits[i]["Proposed Date"] <= date_to)
+            ]
+            if matches:
+                result[site] = matches
+        return result
+
+    def auditor_info(self, sites=None):
+        return {
+            site: info for site, info in self._auditors.items()
+            if sites is None or site in sites
+        }
+
+
+class SQLiteAuditStore(AuditStore):
+    # SQLite-backed store with indexes on site, audit type and date. One connection is shared by
+    # every session (st.cache_resource), so access is serialized with a lock.
+
+    def __init__(self, path="audits.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            # Stores created before audit_key existed get the column; their audits keep a NULL key
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(audits)")]
+            if "audit_key" not in columns:
+                self._conn.execute("ALTER TABLE audits ADD COLUMN audit_key TEXT")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_audits_key ON audits (audit_key)")
+
+    def _bulk_insert(self, audits):
+        added = 0
+        with self._lock, self._conn:
+            for site, audit_type, proposed_date, mandays, rows in audits:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO audits (site, audit_type, proposed_date, mandays, audit_key) VALUES (?, ?, ?, ?, ?)",
+                    (site, audit_type, proposed_date, None if pd.isna(mandays) else float(mandays),
+                     audit_key(site, audit_type, proposed_date, rows))
+                )
+                if cursor.rowcount == 0:
+                    continue
+                added += 1
+                self._conn.executemany(
+                    "INSERT INTO audit_activities (audit_id, position, activity, selected, duration, core_status) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid,) + row for row in rows]
+                )
+        return added
+
+    def save_auditor_info(self, site, info):
+        coded = set(info["coded_auditors"])
+        # An auditor listed twice is stored once (site + auditor is the key), at its first position
+        rows = [
+            (site, position, auditor, int(auditor in coded), float(info["availability"].get(auditor, 0.0)))
+            for position, auditor in enumerate(dict.fromkeys(info["auditors"]))
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM auditors WHERE site = ?", (site,))
+            self._conn.executemany(
+                "INSERT INTO auditors (site, position, auditor, coded, availability) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def sites(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT site FROM audits GROUP BY site ORDER BY MIN(id)")]
+
+    @staticmethod
+    def _in_clause(column, values, clauses, params):
+        values = list(values)
+        clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else "0")
+        params.extend(values)
+
+    def audits(self, sites=None, audit_types=None, date_from=None, date_to=None):
+        clauses, params = [], []
+        if sites is not None:
+            self._in_clause("a.site", sites, clauses, params)
+        if audit_types is not None:
+            self._in_clause("a.audit_type", audit_types, clauses, params)
+        if date_from is not None:
+            clauses.append("a.proposed_date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("a.proposed_date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        query = (
+            "SELECT a.id, a.site, a.audit_type, a.proposed_date, "
+            "aa.activity, aa.selected, aa.duration, aa.core_status "
+            f"FROM audits a LEFT JOIN audit_activities aa ON aa.audit_id = a.id {where} "
+            "ORDER BY a.id, aa.position"
+        )
+        result = {}
+        current_id, audit = None, None
+        with self._lock:
+            for audit_id, site, audit_type, proposed_date, activity, selected, duration, core_status in self._conn.execute(query, params):
+                if audit_id != current_id:
+                    current_id, audit = audit_id, _new_audit(audit_type, proposed_date)
+                    result.setdefault(site, []).append(audit)
+                if activity is not None:
+                    audit["Activities"][activity] = "✔️" if selected else "✖️"
+                    audit["Durations"][activity] = duration
+                    audit["Core Status"][activity] = core_status
+        return result
+
+    def auditor_info(self, sites=None):
+        clauses, params = [], []
+        if sites is not None:
+            self._in_clause("site", sites, clauses, params)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        result = {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT site, auditor, coded, availability FROM auditors {where} ORDER BY site, position", params
+            ).fetchall()
+        for site, auditor, coded, availability in rows:
+            info = result.setdefault(site, {"auditors": [], "coded_auditors": [], "availability": {}})
+            info["auditors"].append(auditor)
+            if coded:
+                info["coded_auditors"].append(auditor)
+            info["availability"][auditor] = availability
+        return result
+
+
+# "memory" for the in-memory store, otherwise a SQLite file path (AUDIT_STORE, default audits.db)
+def open_store(location=None):
+    location = location or os.environ.get("AUDIT_STORE", "audits.db")
+    if location == "memory":
+        return InMemoryAuditStore()
+    return SQLiteAuditStore(location)
@@ -1,147 +1,142 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-from io import BytesIO
-
-# Define required columns
-REQUIRED_COLUMNS = ["Customer Name","Project Number","Standard Name","Project Responsible", "Project Planner","Activity ID", "Project Status", "Split MD Date", "Split Man-Days", "Certificate Validity End Date"]
-
-# Streamlit UI
-st.title("RC Analysis")
-
-# File uploader
-uploaded_file = st.file_uploader("Upload your Excel file", type=["xlsx"])
-
-if uploaded_file:
-    try:
-        df = pd.read_excel(uploaded_file, sheet_name='Sheet1')
-
-        # Check if required columns are present
-        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-        if missing_columns:
-            st.error(f"Missing columns: {', '.join(missing_columns)}. Please upload a valid file.")
-        else:
-            # Selecting the required columns
-            df = df[REQUIRED_COLUMNS]
-
-            df["Split MD Date"] = df["Split MD Date"].astype('datetime64[ns]')
-            df["Certificate Validity End Date"] = df["Certificate Validity End Date"].astype('datetime64[ns]')
-            
-            df["Date Difference"] = (df["Certificate Validity End Date"] - df["Split MD Date"]).dt.days
-
-
-
-            # Categorizing the difference
-            def categorize_days(diff):
-                if pd.isna(diff):
-                    return "N/A"
-                elif 0 <= diff <= 30:
-                    return "0-30 days"
-                elif 31 <= diff <= 60:
-                    return "31-60 days"
-                elif 61 <= diff <= 90:
-                    return "61-90 days"
-                elif 91 <= diff <= 180:
-                    return "91-180 days"
-                elif diff > 180:
-                    return "More than 180 days"
-                else:
-                    return "NA"
-
-            df["Category"] = df["Date Difference"].apply(categorize_days)
-
-            # Adding RC Type column
-            df["RC Type"] = df.apply(lambda row: "RC Not Received" if row["Project Status"] in ["Quote Revision", "Final PA Review"] else "RC Received", axis=1)
-            #df["RC Sub-status"] = df.apply(lambda row: "Quote Revision" if row["RC Type"] == "RC Not Received" and row["Project Status"] == "Quote Revision" else "Final PA Review", axis=1)
-             # Drop duplicate rows based on specific columns
-            #df = df.drop_duplicates(subset=["Project Number", "Project Planner","Activity ID", "Project Status", "Split MD Date", "Split Man-Days"],keep=False)
-
-            # Sort Category column based on defined order
-            CATEGORY_ORDER = ["0-30 days", "31-60 days", "61-90 days", "91-180 days","More than 180 days", "N/A"]
-
-            # Ensure 'Category' is ordered correctly
-            df["Category"] = pd.Categorical(df["Category"].astype(str).str.strip(), categories=CATEGORY_ORDER, ordered=True)
-
-            # Sort the dataframe based on 'Category'
-            df = df.sort_values("Category")
-
-            # Grouping data for visualization
-            rcc = df.groupby(['Category', 'RC Type']) \
-                    .agg({'Split Man-Days': 'sum', 
-                          'Project Planner': lambda x: list(set(x)), 
-                          'Project Responsible': lambda x: list(set(x))}) \
-                    .reset_index()
-
-           
-
-            rcc.columns = ['Category', 'RC Type',  'Man-Days', 'Project Planner','Project Responsible']
-
-            # Dropdown for selecting category
-            selected_category = st.selectbox("Select a Category", ["All"] + list(rcc["Category"].unique()))
-
-            # Filter data based on selection
-            filtered_df = rcc if selected_category == "All" else rcc[rcc['Category'] == selected_category]
-
-            # Create bar chart
-            fig = px.bar(
-                filtered_df,
-                x='Category',
-                y='Man-Days',
-                color='RC Type',
-                text='Man-Days',
-                barmode='stack',
-                title="Sum of Man-Days Category-wise"
-            )
-
-            fig.update_traces(texttemplate='%{text}', textposition='outside')
-
-            # Display plot
-            st.plotly_chart(fig)
-
-            # Display project numbers when a category is selected
-            if selected_category != "All":
-                projects = df[df['Category'] == selected_category]['Project Planner'].unique()
-                st.write(f"**Projects in {selected_category}:**")
-                st.write(", ".join(map(str, projects)) if projects.size > 0 else "No projects found.")
-
-            # Function to download processed data
-            def convert_df_to_excel(dataframe):
-                # Ensure 'Category' is ordered correctly before downloading
-                CATEGORY_ORDER = ["0-30 days", "31-60 days", "61-90 days", "91-180 days","More than 180 days", "N/A"]
-                dataframe["Category"] = pd.Categorical(dataframe["Category"].astype(str).str.strip(), 
-                                                       categories=CATEGORY_ORDER, ordered=True)
-
-                # Sort the dataframe before downloading
-                dataframe = dataframe.sort_values("Category")
-
-                # Convert to Excel
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    dataframe.to_excel(writer, index=False, sheet_name="Processed Data")
-                
-                processed_data = output.getvalue()
-                return processed_data
-
-            # Download button for processed file
-            st.download_button(
-                label="📥 Download Processed Data",
-                data=convert_df_to_excel(df),  # This ensures sorting before download
-                file_name="processed_data.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
-
-
-
-
-
-
-
-
-
-
-
-
-
+from bootstrap import lazy_import, warm_imports
+from excel_export import export_file_name, export_mime, lazy_download
+from rc_ingest import DEFAULT_CACHE_DIR, MissingColumnsError, read_rc_export
+from rc_incremental import NAME_PATTERN as SNAPSHOT_NAME_PATTERN, SnapshotStore, processed_frame
+from rc_processing import build_rc_cube, process_rc
+from instrumentation import stage
+from display_layer import limit_groups, paged_dataframe
+from profiling_panel import profiled_rerun
+
+# plotly is only imported when the chart is drawn
+px = lazy_import("plotly.express")
+
+# Longer project lists are shown as a paged table instead of one line of text
+MAX_LISTED_PROJECTS = 100
+
+
+# Header is validated before any data is parsed; parsed files are cached in memory and as Parquet on disk
+@st.cache_data(show_spinner="Reading file...")
+def load_rc_export(data):
+    return read_rc_export(data, sheet_name='Sheet1')
+
+
+# Snapshots for incremental mode are shared by every session and kept on disk (RC_SNAPSHOT_DIR)
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore(os.environ.get("RC_SNAPSHOT_DIR", DEFAULT_CACHE_DIR))
+
+
+# Record stage timings for this rerun (panel: open the page with ?profile=1); tracing and
+# profiling are stopped however the script ends
+with profiled_rerun("test.py"):
+    # Streamlit UI
+    st.title("RC Analysis")
+
+    # Load plotly in the background while the user picks a file
+    warm_imports(["plotly.express"])
+
+    # Incremental mode compares each upload with a stored snapshot by Project Number + Activity ID and
+    # only categorizes new or changed rows; the aggregates are updated by adding and subtracting deltas
+    incremental = st.sidebar.toggle("Incremental mode", help="Compare uploads with a stored snapshot and only process the changes")
+    snapshot_name = None
+    if incremental:
+        snapshot_name = st.sidebar.text_input("Snapshot name", value="default").strip() or "default"
+        if not SNAPSHOT_NAME_PATTERN.match(snapshot_name):
+            st.sidebar.error("Snapshot names may only contain letters, digits, '-' and '_' (at most 64 characters).")
+            st.stop()
+        if st.sidebar.button("Reset Snapshot"):
+            get_snapshot_store().reset(snapshot_name)
+            st.session_state.pop("rc_digest", None)
+
+    # File uploader
+    uploaded_file = st.file_uploader("Upload your Excel file", type=["xlsx"])
+
+    if uploaded_file:
+        try:
+            file_bytes = uploaded_file.getvalue()
+            digest = hashlib.sha256(file_bytes).hexdigest()
+            analysis_key = (digest, snapshot_name)
+
+            missing_columns = []
+            try:
+                # Processing and aggregation run once per upload; widget reruns reuse them from session state
+                if st.session_state.get("rc_digest") != analysis_key:
+                    if incremental:
+                        raw = load_rc_export(file_bytes)
+                        try:
+                            delta, snapshot = get_snapshot_store().apply(snapshot_name, raw)
+                        except (OSError, ValueError, TypeError) as e:
+                            st.error(f"Could not update snapshot '{snapshot_name}': {e}")
+                            st.stop()
+                        st.session_state.rc_delta = delta
+                        rows = snapshot.rows
+                        st.session_state.rc_analysis = (lambda: processed_frame(rows),) + snapshot.cube()
+                    else:
+                        df = process_rc(load_rc_export(file_bytes))
+                        st.session_state.rc_analysis = (lambda: df,) + build_rc_cube(df)
+                    st.session_state.rc_digest = analysis_key
+            except MissingColumnsError as e:
+                missing_columns = e.missing
+
+            # Check if required columns are present
+            if missing_columns:
+                st.error(f"Missing columns: {', '.join(missing_columns)}. Please upload a valid file.")
+            else:
+                # Processed rows (built on demand), Category x RC Type aggregate and planners per Category
+                processed_rows, rcc, projects_by_category = st.session_state.rc_analysis
+
+                if incremental:
+                    delta = st.session_state.rc_delta
+                    st.info(f"Compared with snapshot '{snapshot_name}': {delta['added']:,} new, {delta['changed']:,} changed, "
+                            f"{delta['removed']:,} removed and {delta['unchanged']:,} unchanged rows.")
+
+                # Dropdown for selecting category
+                selected_category = st.selectbox("Select a Category", ["All"] + list(rcc["Category"].unique()))
+
+                # Filter data based on selection
+                filtered_df = rcc if selected_category == "All" else rcc[rcc['Category'] == selected_category]
+
+                with stage("Chart", rows=len(filtered_df)):
+                    # Create bar chart; with many RC Types the smallest are stacked together as "Other"
+                    chart_df = limit_groups(filtered_df, "RC Type", "Man-Days", ["Category"])
+                    fig = px.bar(
+                        chart_df,
+                        x='Category',
+                        y='Man-Days',
+                        color='RC Type',
+                        text='Man-Days',
+                        barmode='stack',
+                        title="Sum of Man-Days Category-wise"
+                    )
+
+                    fig.update_traces(texttemplate='%{text}', textposition='outside')
+
+                    # Display plot
+                    st.plotly_chart(fig)
+
+                # Display project numbers when a category is selected
+                if selected_category != "All":
+                    projects = projects_by_category.get(selected_category, np.array([]))
+                    st.write(f"**Projects in {selected_category}:**")
+                    if projects.size > MAX_LISTED_PROJECTS:
+                        paged_dataframe(pd.DataFrame({"Project Planner": projects}), "projects")
+                    else:
+                        st.write(", ".join(map(str, projects)) if projects.size > 0 else "No projects found.")
+
+                # Download processed data (already Category-ordered and sorted by process_rc);
+                # the file is only written when the button is clicked and is reused for the same upload
+                export_format = st.radio("Download format", ["xlsx", "csv", "parquet"], horizontal=True)
+                st.download_button(
+                    label="📥 Download Processed Data",
+                    data=lazy_download("rc_processed", analysis_key, lambda: {"Processed Data": processed_rows()}, export_format),
+                    file_name=export_file_name("processed_data", export_format),
+                    mime=export_mime(export_format)
+                )
+
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import lazy_import
+from instrumentation import timed
+
+# scikit-learn and joblib are only imported when a search actually runs
+joblib = lazy_import("joblib")
+linear_model = lazy_import("sklearn.linear_model")
+model_selection = lazy_import("sklearn.model_selection")
+preprocessing = lazy_import("sklearn.preprocessing")
+
+DEFAULT_L1_RATIOS = [0.1, 0.5, 0.7, 0.9, 0.95, 0.99, 1.0]
+
+
+# Log-spaced alphas from the smallest alpha that zeroes every coefficient downwards,
+# largest first so each coordinate-descent fit warm-starts from the previous one
+def alpha_grid(X_scaled, y, l1_ratio, n_alphas=100, eps=1e-3):
+    if not 0 < l1_ratio <= 1:
+        raise ValueError(f"l1_ratio must be in (0, 1], got {l1_ratio}")
+    n_samples = X_scaled.shape[0]
+    alpha_max = np.abs(X_scaled.T @ (y - y.mean())).max() / (n_samples * l1_ratio)
+    if alpha_max <= np.finfo(float).resolution:
+        alpha_max = np.finfo(float).resolution
+    return np.geomspace(alpha_max, alpha_max * eps, num=n_alphas)
+
+
+# One CV fold: scale on the training part, walk the whole alpha path for every
+# l1_ratio and return the held-out MSE of every (l1_ratio, alpha) pair
+def _fit_fold(fold, X, y, train_idx, test_idx, l1_ratios, alphas):
+    start = time.perf_counter()
+
+    scaler = preprocessing.StandardScaler()
+    X_train = scaler.fit_transform(X[train_idx])
+    X_test = scaler.transform(X[test_idx])
+    y_mean = y[train_idx].mean()
+
+    mse = np.empty(alphas.shape)
+    for i, l1_ratio in enumerate(l1_ratios):
+        _, coefs, _ = linear_model.enet_path(X_train, y[train_idx] - y_mean, l1_ratio=l1_ratio, alphas=alphas[i])
+        predictions = X_test @ coefs + y_mean
+        mse[i] = ((predictions - y[test_idx, None]) ** 2).mean(axis=0)
+
+    return fold, mse, time.perf_counter() - start, len(train_idx), len(test_idx)
+
+
+# K-fold search over l1_ratios x alpha paths, folds run in a process pool (n_jobs=-1 uses every core)
+@timed("Tune ElasticNet")
+def tune_elasticnet(X, y, l1_ratios=DEFAULT_L1_RATIOS, n_alphas=100, eps=1e-3, cv=5, n_jobs=-1, random_state=42):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    l1_ratios = sorted(float(r) for r in l1_ratios)
+
+    X_scaled = preprocessing.StandardScaler().fit_transform(X)
+    alphas = np.array([alpha_grid(X_scaled, y, r, n_alphas, eps) for r in l1_ratios])
+
+    folds = model_selection.KFold(n_splits=cv, shuffle=True, random_state=random_state).split(X)
+    fold_results = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_fit_fold)(fold, X, y, train_idx, test_idx, l1_ratios, alphas)
+        for fold, (train_idx, test_idx) in enumerate(folds, start=1)
+    )
+
+    mse = np.stack([result[1] for result in fold_results])
+    mean_mse = mse.mean(axis=0)
+    best_i, best_j = np.unravel_index(np.argmin(mean_mse), mean_mse.shape)
+
+    cv_results = pd.DataFrame({
+        "l1_ratio": np.repeat(l1_ratios, alphas.shape[1]),
+        "alpha": alphas.ravel(),
+        "Mean MSE": mean_mse.ravel(),
+        "Std MSE": mse.std(axis=0).ravel(),
+    }).sort_values("Mean MSE", ignore_index=True)
+
+    fold_times = pd.DataFrame(
+        [(fold, train_rows, test_rows, wall_time) for fold, _, wall_time, train_rows, test_rows in fold_results],
+        columns=["Fold", "Train Rows", "Test Rows", "Wall Time (s)"]
+    )
+
+    return {
+        "alpha": float(alphas[best_i, best_j]),
+        "l1_ratio": l1_ratios[best_i],
+        "cv_results": cv_results,
+        "fold_times": fold_times,
+    }